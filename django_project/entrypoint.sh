@@ -1,7 +1,7 @@
 #!/bin/sh
 
-python manage.py collectstatic --noinput
-
-python manage.py migrate
-
-python -m gunicorn --bind 0.0.0.0:8000 --workers 3 sheet_music_database.wsgi:application
\ No newline at end of file
+# Static files are built into the image and migrations run in the one-shot
+# release service (release.sh), so starting the web container is just gunicorn.
+# --preload imports the application once in the master; workers share it
+# copy-on-write.
+exec python -m gunicorn --preload --bind 0.0.0.0:8000 --workers "${GUNICORN_WORKERS:-3}" sheet_music_database.wsgi:application
@@ -0,0 +1,16 @@
+#!/bin/sh
+set -e
+
+# One-shot release step (docker-compose service "release"), run before the web
+# and worker containers start.
+
+# Publish the static files built into this image to the volume nginx serves.
+# Files of the previous release stay, so pages rendered by still running old
+# workers keep resolving their hashed names.
+cp -a /app/staticfiles/. /srv/staticfiles/
+
+if python manage.py migrate --check >/dev/null 2>&1; then
+    echo "No pending migrations."
+else
+    python manage.py migrate --noinput
+fi
@@ -1,6 +1,66 @@
+from django import forms
 from django.contrib import admin
-from .models import Sheet
+from django.utils import timezone
+from .models import OutboundEmail, PreviewJob, Sheet, Tag
+from .previews import queue_preview_if_needed
+from .tagging import parse_tag_names, set_sheet_tags
 
 # Register your models here.
 
-admin.site.register(Sheet)
\ No newline at end of file
+
+class SheetAdminForm(forms.ModelForm):
+    # Same comma-separated tag input as the add/edit views, resolved in bulk
+    tag_names = forms.CharField(label="Tags", required=False, help_text="Comma-separated.")
+
+    class Meta:
+        model = Sheet
+        exclude = ["tags"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields["tag_names"].initial = ", ".join(t.name for t in self.instance.tags.all())
+
+    def clean_tag_names(self):
+        return parse_tag_names(self.cleaned_data["tag_names"])
+
+
+@admin.register(Sheet)
+class SheetAdmin(admin.ModelAdmin):
+    form = SheetAdminForm
+    list_display = ["title", "composer", "cast", "season", "use", "public", "date_modified"]
+    list_filter = ["public", "cast", "season", "use"]
+    search_fields = ["title", "composer"]
+    readonly_fields = ["slug"]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        set_sheet_tags(form.instance, form.cleaned_data["tag_names"])
+        if "sheet_file" in form.changed_data:
+            queue_preview_if_needed(form.instance)
+
+
+@admin.register(PreviewJob)
+class PreviewJobAdmin(admin.ModelAdmin):
+    list_display = ["sheet", "status", "attempts", "queued_at", "finished_at"]
+    list_filter = ["status"]
+    readonly_fields = ["sheet", "attempts", "last_error", "queued_at", "started_at", "finished_at"]
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    search_fields = ["name"]
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ["subject", "to", "status", "attempts", "next_attempt_at", "sent_at"]
+    list_filter = ["status"]
+    readonly_fields = ["attempts", "last_error", "created_at", "sent_at"]
+    actions = ["requeue"]
+
+    @admin.action(description="Re-queue selected emails")
+    def requeue(self, request, queryset):
+        queryset.exclude(status=OutboundEmail.SENT).update(
+            status=OutboundEmail.QUEUED, attempts=0, next_attempt_at=timezone.now()
+        )
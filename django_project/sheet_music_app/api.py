@@ -0,0 +1,173 @@
+"""
+Read-only JSON API over the catalog for the choir app and integrations.
+
+Notes for future maintainers:
+- ``/api/sheets`` takes the home() filters (``cast``, ``season``, ``use``,
+  ``year``, ``q``) and visibility rules from catalog.py, so it lists exactly
+  what the HTML listing shows to the same user.
+- Rows are read with ``.values()`` restricted to the columns behind the
+  requested ``?fields=`` (sparse fieldsets), so no model instances are built.
+  Tag names for a whole page come from one query on the through table.
+- The plain listing pages by ``(title, id)`` cursor (pagination.KeysetPaginator,
+  ``?cursor=``); search results are relevance ordered and use ``?page=``
+  numbers, like the HTML listing.
+- Choice fields are returned as their stored codes (e.g. ``"CHRISTMAS"``).
+"""
+
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from django.db.models import Count, Q
+from django.urls import reverse
+
+from .catalog import filter_sheets, sheets_for_visibility
+from .downloads import file_url
+from .models import Sheet, Tag
+from .pagination import CachedCountPaginator, KeysetPaginator
+from .search import search_sheets
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# API field -> Sheet column
+SHEET_FIELDS = {
+    "id": "id",
+    "slug": "slug",
+    "title": "title",
+    "composer": "composer",
+    "arranger": "arranger",
+    "publisher": "publisher",
+    "isbn": "isbn",
+    "publication_year": "publication_year",
+    "cast": "cast",
+    "season": "season",
+    "use": "use",
+    "public": "public",
+    "description": "description",
+    "date_modified": "date_modified",
+}
+# Computed fields and the columns they are built from
+COMPUTED_FIELDS = {
+    "tags": ["id"],
+    "url": ["id", "slug"],
+    "file_url": ["id", "sheet_file"],
+}
+DEFAULT_FIELDS = [
+    "id", "slug", "title", "composer", "arranger", "publication_year", "cast", "season", "use", "tags",
+]
+
+
+class ApiError(ValueError):
+    pass
+
+
+def parse_fields(value):
+    """Requested field names from ``?fields=a,b``; the defaults when empty."""
+    fields = [name.strip() for name in (value or "").split(",") if name.strip()]
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    unknown = [name for name in fields if name not in SHEET_FIELDS and name not in COMPUTED_FIELDS]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+
+def parse_limit(value):
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+
+
+def sheet_columns(fields, extra=()):
+    """Sheet columns to read for the API ``fields`` (plus ``extra``)."""
+    columns = list(extra)
+    for name in fields:
+        columns.extend(COMPUTED_FIELDS.get(name) or [SHEET_FIELDS[name]])
+    return list(dict.fromkeys(columns))
+
+
+def _tag_names(sheet_ids):
+    """``{sheet id: [tag names]}`` for a page of sheets, in one query."""
+    names = defaultdict(list)
+    rows = (
+        Sheet.tags.through.objects.filter(sheet_id__in=sheet_ids)
+        .order_by("tag__name")
+        .values_list("sheet_id", "tag__name")
+    )
+    for sheet_id, name in rows:
+        names[sheet_id].append(name)
+    return names
+
+
+def serialize(rows, fields):
+    """Output dicts with exactly ``fields`` from ``.values()`` rows."""
+    tags = _tag_names([row["id"] for row in rows]) if "tags" in fields else {}
+    results = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            if name == "tags":
+                item[name] = tags.get(row["id"], [])
+            elif name == "url":
+                item[name] = reverse("sheet_profile", kwargs={"slug": row["slug"]}) if row["slug"] else None
+            elif name == "file_url":
+                item[name] = file_url(row["id"], row["sheet_file"]) if row["sheet_file"] else None
+            else:
+                item[name] = row[SHEET_FIELDS[name]]
+        results.append(item)
+    return results
+
+
+def _link(params, **changes):
+    params = params.copy()
+    for key in ("cursor", "page"):
+        params.pop(key, None)
+    params.update(changes)
+    return f"{reverse('api_sheets')}?{urlencode(params)}"
+
+
+def list_sheets(visibility, params):
+    """Payload of ``/api/sheets`` for GET ``params`` (a QueryDict)."""
+    fields = parse_fields(params.get("fields"))
+    limit = parse_limit(params.get("limit"))
+    sheets = filter_sheets(sheets_for_visibility(visibility), params)
+    q = params.get("q", "").strip()
+    if q:
+        rows = search_sheets(sheets, q).values(*sheet_columns(fields, ["id"]))
+        paginator = CachedCountPaginator(rows, limit)
+        page = paginator.get_page(params.get("page"))
+        next_link = _link(params, page=page.next_page_number()) if page.has_next() else None
+        previous_link = _link(params, page=page.previous_page_number()) if page.has_previous() else None
+    else:
+        rows = sheets.values(*sheet_columns(fields, ["id", "title"]))
+        paginator = KeysetPaginator(rows, limit, keys=("title", "id"))
+        page = paginator.get_page(params.get("cursor"))
+        next_link = _link(params, cursor=page.next_cursor) if page.has_next() else None
+        previous_link = _link(params, cursor=page.previous_cursor) if page.has_previous() else None
+    return {
+        "count": paginator.count,
+        "next": next_link,
+        "previous": previous_link,
+        "results": serialize(list(page), fields),
+    }
+
+
+def get_sheet(visibility, pk, params):
+    """Payload of ``/api/sheets/<pk>``, or None if the sheet is not visible."""
+    fields = parse_fields(params.get("fields"))
+    rows = list(sheets_for_visibility(visibility).filter(pk=pk).values(*sheet_columns(fields, ["id"])))
+    return serialize(rows, fields)[0] if rows else None
+
+
+def list_tags(visibility):
+    """All tags with the number of sheets of ``visibility`` carrying them."""
+    sheet_filter = Q(sheets__public=True) if visibility == "public" else Q()
+    tags = (
+        Tag.objects.annotate(sheet_count=Count("sheets", filter=sheet_filter))
+        .order_by("name")
+        .values("id", "name", "sheet_count")
+    )
+    if visibility == "public":
+        # Tags used only on private sheets are not disclosed
+        tags = tags.filter(sheet_count__gt=0)
+    return {"results": list(tags)}
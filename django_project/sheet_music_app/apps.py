@@ -5,3 +5,7 @@ from django.db.models.signals import post_migrate
 class SheetMusicAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sheet_music_app'
+
+    def ready(self):
+        # Register signal handlers (search index maintenance etc.)
+        from . import signals  # noqa: F401
@@ -0,0 +1,49 @@
+"""
+Authentication backends that cache the user row in the shared cache.
+
+Notes for future maintainers:
+- Django loads request.user on every authenticated request through the
+  backend's ``get_user``; these backends answer it from the cache (one read,
+  no query). Together with ``cached_db`` sessions and the role stamp kept in
+  the session (roles.py), an authenticated request needs no database query
+  before the view runs.
+- The cached user is dropped whenever the User row is saved or deleted
+  (signals.py), which includes password changes and ``last_login`` updates.
+  Group membership is not part of it; roles.py versions that separately.
+- Both configured backends are wrapped so that sessions created by either
+  login path (Django's LoginView or allauth) benefit.
+"""
+
+from allauth.account.auth_backends import AuthenticationBackend
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_CACHE_SECONDS = getattr(settings, "USER_CACHE_SECONDS", 15 * 60)
+
+
+def user_cache_key(user_id):
+    return f"auth_user:{user_id}"
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedUserMixin:
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_CACHE_SECONDS)
+        return user
+
+
+class CachedModelBackend(CachedUserMixin, ModelBackend):
+    pass
+
+
+class CachedAllauthBackend(CachedUserMixin, AuthenticationBackend):
+    pass
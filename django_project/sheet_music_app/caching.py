@@ -0,0 +1,83 @@
+"""
+Helpers for the shared cache tier: versioned namespaces and stampede protection.
+
+Notes for future maintainers:
+- CACHES (settings.py) is shared by all workers: Redis in docker-compose,
+  memcached or a file-based cache (development) per CACHE_URL. Every key
+  carries the KEY_PREFIX namespace and the CACHE_VERSION of the deployment
+  (Django adds both), so bumping CACHE_VERSION drops the whole cache at once.
+- ``namespace_version`` / ``bump_namespace`` version a family of keys (tag
+  names on cards, role stamps): one ``incr`` invalidates all of them without
+  finding or deleting any key.
+- ``get_or_build`` guards expensive values (facet counts, listing totals)
+  against stampedes. Entries are kept ``STALE_SECONDS`` past their timeout;
+  when one goes stale, the caller that takes a short lock (``cache.add``)
+  rebuilds it while everybody else keeps getting the stale value. On a cold
+  miss the other callers wait briefly for the lock holder instead of all
+  running the same query.
+- The lock and ``bump_namespace`` rely on ``add`` and ``incr`` being atomic,
+  which holds for Redis and memcached only. The file and locmem backends do
+  a read then a write, so across processes two callers may both build a
+  value, or a concurrent bump may be lost; fine for development, not for
+  production.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+STALE_SECONDS = getattr(settings, "CACHE_STALE_SECONDS", 60)
+LOCK_SECONDS = 10
+WAIT_SECONDS = 2
+WAIT_STEP = 0.05
+
+
+def namespace_version(namespace):
+    return cache.get_or_set(f"{namespace}:version", 1, None)
+
+
+def bump_namespace(namespace):
+    """Invalidate every key built with the namespace's current version."""
+    key = f"{namespace}:version"
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key expired or was never set; any new value invalidates old keys
+        cache.set(key, namespace_version(namespace) + 1, None)
+
+
+def _store(key, value, timeout):
+    if timeout is None:
+        cache.set(key, (value, None), None)
+    else:
+        cache.set(key, (value, time.time() + timeout), timeout + STALE_SECONDS)
+
+
+def get_or_build(key, build, timeout):
+    """Cached value of ``key``; ``build()`` computes it, at most once at a time."""
+    entry = cache.get(key)
+    lock_key = f"{key}:lock"
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until is None or time.time() < fresh_until:
+            return value
+        if not cache.add(lock_key, 1, LOCK_SECONDS):
+            return value  # someone else is refreshing it
+    elif not cache.add(lock_key, 1, LOCK_SECONDS):
+        deadline = time.monotonic() + WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_STEP)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        # The lock holder is too slow (or died); build it ourselves
+        value = build()
+        _store(key, value, timeout)
+        return value
+    try:
+        value = build()
+        _store(key, value, timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
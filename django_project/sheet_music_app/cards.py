@@ -0,0 +1,80 @@
+"""
+Fragment cache for the sheet cards on the home listing.
+
+Notes for future maintainers:
+- A card is cached under (sheet id, date_modified, tag version, viewer role),
+  so edits invalidate it simply by changing the key; nothing is deleted.
+- Tag m2m changes touch the sheet's date_modified, and renaming/deleting a
+  Tag bumps the global tag version (see signals.py).
+- Hit/miss counters are per process; staff can read them at /cache-stats/.
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .caching import bump_namespace, namespace_version
+
+CARD_TEMPLATE = "partials/sheet_card.html"
+CARD_CACHE_SECONDS = getattr(settings, "SHEET_CARD_CACHE_SECONDS", 60 * 60 * 24)
+TAG_NAMESPACE = "sheet_card:tags"
+
+# Viewer roles that change what a card shows (see partials/sheet_card.html)
+VIEWER_ROLES = ("public", "internal", "editor")
+
+stats = Counter()
+
+
+def tag_version():
+    return namespace_version(TAG_NAMESPACE)
+
+
+def bump_tag_version():
+    bump_namespace(TAG_NAMESPACE)
+
+
+def card_cache_key(sheet, viewer_role, version=None):
+    version = tag_version() if version is None else version
+    modified = sheet.date_modified.timestamp() if sheet.date_modified else 0
+    return f"sheet_card:{sheet.pk}:{modified:.6f}:{version}:{viewer_role}"
+
+
+def render_sheet_cards(sheets, viewer_role):
+    """Return the card HTML for each of ``sheets``, from cache when possible.
+
+    All keys are fetched with one get_many() and misses stored with one
+    set_many(), so a page costs two cache round trips at most.
+    """
+    version = tag_version()
+    keys = [card_cache_key(sheet, viewer_role, version) for sheet in sheets]
+    cached = cache.get_many(keys)
+    stats["hits"] += len(cached)
+    stats["misses"] += len(keys) - len(cached)
+
+    # Tags are only needed to render misses, so prefetch them for those alone
+    prefetch_related_objects([s for s, k in zip(sheets, keys) if k not in cached], "tags")
+
+    template = get_template(CARD_TEMPLATE)
+    cards, missing = [], {}
+    for sheet, key in zip(sheets, keys):
+        html = cached.get(key)
+        if html is None:
+            html = template.render({"sheet": sheet, "viewer_role": viewer_role})
+            missing[key] = html
+        cards.append(mark_safe(html))
+    if missing:
+        cache.set_many(missing, CARD_CACHE_SECONDS)
+    return cards
+
+
+def card_cache_stats():
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hit_rate": round(stats["hits"] / lookups, 4) if lookups else None,
+    }
@@ -0,0 +1,52 @@
+"""
+Shared catalog querysets: visibility rules and the home() filter dimensions.
+
+Everything that lists sheets (home page, exports, API) should build its
+queryset here so access control and filtering stay identical everywhere.
+The Sheet indexes (see Sheet.Meta) are designed around exactly these shapes.
+"""
+
+from .models import Sheet
+from .roles import roles_for_user
+
+# GET parameter -> Sheet field for the sidebar filters. 'all' means no filter.
+FILTER_FIELDS = {
+    "cast": "cast",
+    "season": "season",
+    "use": "use",
+    "year": "publication_year",
+}
+
+
+def can_view_private(user):
+    """Staff, superusers and members of the "Internal" group see private sheets."""
+    return roles_for_user(user).can_view_private
+
+
+def visibility_class(user):
+    """"all" for users who may see private sheets, otherwise "public"."""
+    return "all" if can_view_private(user) else "public"
+
+
+def sheets_for_visibility(visibility):
+    """Base queryset for a visibility class returned by ``visibility_class``."""
+    if visibility == "all":
+        return Sheet.objects.all()
+    return Sheet.objects.filter(public=True)
+
+
+def visible_sheets(user):
+    """All sheets ``user`` may see: everything for internal users, else public only."""
+    return sheets_for_visibility(visibility_class(user))
+
+
+def filter_sheets(sheets, params):
+    """Apply the sidebar filters from a GET-like mapping to ``sheets``."""
+    for param, field in FILTER_FIELDS.items():
+        value = params.get(param)
+        if not value or value == "all":
+            continue
+        if field == "publication_year" and not value.isdigit():
+            continue  # ignore malformed years rather than failing the page
+        sheets = sheets.filter(**{field: value})
+    return sheets
@@ -0,0 +1,119 @@
+"""
+HTTP conditional responses (ETag / Last-Modified / 304) for home and sheet_profile.
+
+Notes for future maintainers:
+- The catalog version is the newest CatalogChange row (sync.py): every Sheet
+  and Tag write appends one, including the bulk paths, so its id is bumped by
+  any change that can alter the listing, and its ``created_at`` is the
+  catalog's Last-Modified. Reading it is one index-only lookup, and unlike a
+  cache counter it is the same for every worker.
+- sheet_profile uses the sheet's ``date_modified`` and its latest change
+  instead, in the same single query. The lookup applies the viewer's
+  visibility (catalog.py), so a private slug gets no ETag and the view
+  answers 404 for it, exactly like a slug that does not exist.
+- The ETag also covers everything else the page depends on: viewer role,
+  user, session (a new login rotates the CSRF token embedded in forms), the
+  full query string and SHEET_ETAG_RELEASE, which deployments set so that a
+  template change is not answered with 304.
+- Django's ``condition`` decorator compares these with If-None-Match /
+  If-Modified-Since before the view body runs, so a 304 skips the listing
+  queries and the template. Both functions memoise their lookup on the
+  request; together they cost a single query.
+- Pages carrying flash messages are never answered with 304 (the message
+  would be lost), and responses are ``private, no-cache``: browsers keep them
+  but revalidate on every navigation.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import OuterRef, Subquery
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .catalog import sheets_for_visibility
+from .models import CatalogChange
+from .roles import get_roles
+
+RELEASE = getattr(settings, "SHEET_ETAG_RELEASE", "")
+
+
+def _has_messages(request):
+    # len() does not mark the messages as read
+    return len(get_messages(request)) > 0
+
+
+def _etag(request, *parts):
+    roles = get_roles(request)
+    session_key = getattr(request, "session", None) and request.session.session_key
+    raw = repr((RELEASE, roles.viewer_role, request.user.pk, session_key, request.get_full_path(), parts))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _later(*moments):
+    moments = [moment for moment in moments if moment]
+    return max(moments) if moments else None
+
+
+def catalog_version(request):
+    """(id, created_at) of the latest catalog change, once per request."""
+    if not hasattr(request, "_catalog_version"):
+        request._catalog_version = (
+            CatalogChange.objects.order_by("-pk").values_list("pk", "created_at").first() or (0, None)
+        )
+    return request._catalog_version
+
+
+def home_etag(request, *args, **kwargs):
+    if _has_messages(request):
+        return None
+    return _etag(request, "home", catalog_version(request)[0])
+
+
+def home_last_modified(request, *args, **kwargs):
+    if _has_messages(request):
+        return None
+    # A later login (another user in the same browser) must not match
+    return _later(catalog_version(request)[1], getattr(request.user, "last_login", None))
+
+
+def _sheet_state(request, slug):
+    """(pk, date_modified, latest change id) of the sheet, once per request."""
+    if not hasattr(request, "_sheet_state"):
+        # The change id also moves when a tag of the sheet is renamed, which
+        # leaves date_modified alone
+        last_change = (
+            CatalogChange.objects.filter(kind=CatalogChange.SHEET, object_id=OuterRef("pk"))
+            .order_by("-pk")
+            .values("pk")[:1]
+        )
+        visibility = "all" if get_roles(request).can_view_private else "public"
+        request._sheet_state = (
+            sheets_for_visibility(visibility)
+            .filter(slug=slug)
+            .annotate(last_change=Subquery(last_change))
+            .values_list("pk", "date_modified", "last_change")
+            .first()
+        )
+    return request._sheet_state
+
+
+def sheet_etag(request, slug, *args, **kwargs):
+    state = _sheet_state(request, slug)
+    if state is None or _has_messages(request):
+        return None  # the view answers 404 itself
+    return _etag(request, "sheet", state[0], state[1].timestamp(), state[2])
+
+
+def sheet_last_modified(request, slug, *args, **kwargs):
+    state = _sheet_state(request, slug)
+    if state is None or _has_messages(request):
+        return None
+    return _later(state[1], getattr(request.user, "last_login", None))
+
+
+def revalidate(response):
+    """Mark a conditional page as private and always revalidated."""
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Cookie"])
+    return response
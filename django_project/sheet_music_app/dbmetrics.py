@@ -0,0 +1,93 @@
+"""
+Per-worker database connection metrics.
+
+Notes for future maintainers:
+- Connections are persistent (CONN_MAX_AGE) and health-checked
+  (CONN_HEALTH_CHECKS); both come from the environment, see DATABASES in
+  settings.py. A gunicorn worker therefore keeps one connection and reuses
+  it across requests instead of paying the TCP + auth handshake each time.
+- ``DBMetricsMiddleware`` acquires the connection up front, the same way
+  Django would on the first query (health check, reconnect if needed), and
+  times it. It also counts and times the queries of the request with an
+  ``execute_wrapper`` and hands them to the per-view request metrics
+  (metrics.py). Totals are per process, like the card cache stats, and are
+  shown by the staff ``cache_stats`` view.
+- With health checks on, a reused connection is pinged once per request
+  before use; a dead one is replaced transparently. A new connection costs a
+  full connect, so ``reuse_ratio`` close to 1 and a low ``acquire_ms_avg``
+  mean CONN_MAX_AGE works.
+"""
+
+import time
+from collections import Counter
+
+from django.db import DatabaseError, connection
+
+from .metrics import current_timings, finish_request, start_request
+
+stats = Counter()
+_max = Counter()
+
+
+def _time_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats["queries"] += 1
+        stats["sql_ms"] += elapsed * 1000
+        timings = current_timings()
+        if timings is not None:
+            timings.add_query(sql, elapsed)
+
+
+def acquire_connection():
+    """Make the default connection usable; return (seconds, reused)."""
+    before = connection.connection
+    start = time.perf_counter()
+    try:
+        connection.close_if_health_check_failed()
+        connection.ensure_connection()
+    except DatabaseError:
+        pass  # the view's first query raises the real error
+    elapsed = time.perf_counter() - start
+    return elapsed, before is not None and connection.connection is before
+
+
+class DBMetricsMiddleware:
+    """Time connection acquisition, queries and templates for every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings, token = start_request()
+        elapsed, reused = acquire_connection()
+        stats["requests"] += 1
+        stats["reused" if reused else "connected"] += 1
+        stats["acquire_ms"] += elapsed * 1000
+        _max["acquire_ms"] = max(_max["acquire_ms"], elapsed * 1000)
+        queries_before = stats["queries"]
+        with connection.execute_wrapper(_time_query):
+            response = self.get_response(request)
+        _max["queries"] = max(_max["queries"], stats["queries"] - queries_before)
+        return finish_request(request, response, timings, token)
+
+
+def db_stats():
+    requests = stats["requests"]
+    return {
+        "requests": requests,
+        "connections_opened": stats["connected"],
+        "connections_reused": stats["reused"],
+        "reuse_ratio": round(stats["reused"] / requests, 3) if requests else None,
+        "acquire_ms_avg": round(stats["acquire_ms"] / requests, 3) if requests else None,
+        "acquire_ms_max": round(_max["acquire_ms"], 3),
+        "queries": stats["queries"],
+        "queries_per_request": round(stats["queries"] / requests, 2) if requests else None,
+        "queries_per_request_max": _max["queries"],
+        "sql_ms_avg": round(stats["sql_ms"] / requests, 3) if requests else None,
+        "conn_max_age": connection.settings_dict.get("CONN_MAX_AGE"),
+        "health_checks": connection.settings_dict.get("CONN_HEALTH_CHECKS"),
+    }
@@ -0,0 +1,79 @@
+"""
+Authorized delivery of sheet files.
+
+Notes for future maintainers:
+- Sheet files (and their page images, pages.py) are not served from /media/. ``sheet_file`` (views.py)
+  checks visibility with the same rules as home() (catalog.visible_sheets,
+  one indexed query) and answers with an empty response carrying
+  ``X-Accel-Redirect``. nginx then serves the file from an ``internal``
+  location itself, with sendfile, Range requests (the PDF <embed> seeks) and
+  ETag/If-None-Match handling, so Python never touches the bytes.
+- File URLs carry the blob digest (``?v=``). When it matches the current file
+  the response may be cached for a year; the content behind a content
+  addressed name cannot change. It is ``private`` because the file is behind
+  a login.
+- Without nginx (SHEET_FILE_X_ACCEL = False, e.g. runserver) the file is
+  streamed by Django instead, without Range support.
+"""
+
+import mimetypes
+import posixpath
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header
+
+from .storage import blob_digest, is_blob, sheet_storage
+
+USE_X_ACCEL = getattr(settings, "SHEET_FILE_X_ACCEL", True)
+# nginx location marked ``internal`` that aliases MEDIA_ROOT
+ACCEL_PREFIX = getattr(settings, "SHEET_FILE_ACCEL_PREFIX", "/protected-media/")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def file_version(name):
+    return blob_digest(name) if is_blob(name) else ""
+
+
+def sheet_file_url(sheet, download=False):
+    """URL of ``sheet``'s file through the authorized download view."""
+    return file_url(sheet.pk, sheet.sheet_file.name, download)
+
+
+def file_url(sheet_pk, name, download=False):
+    """``sheet_file_url`` from plain values (no model instance needed)."""
+    params = {}
+    version = file_version(name)
+    if version:
+        params["v"] = version
+    if download:
+        params["download"] = 1
+    url = reverse("sheet_file", kwargs={"pk": sheet_pk})
+    return f"{url}?{urlencode(params)}" if params else url
+
+
+def download_name(sheet_slug, sheet_pk, name):
+    return (sheet_slug or f"noty-{sheet_pk}") + posixpath.splitext(name)[1].lower()
+
+
+def file_response(name, filename, immutable=False, as_attachment=False):
+    """Response delivering stored file ``name`` (sheet file or page image) as ``filename``.
+
+    ``immutable`` marks URLs that pin the content (a matching ``?v=``).
+    """
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if USE_X_ACCEL:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = quote(ACCEL_PREFIX + name)
+    else:
+        response = FileResponse(sheet_storage.open(name, "rb"), content_type=content_type)
+    response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+    if immutable:
+        patch_cache_control(response, private=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        # Revalidate every time; nginx answers If-None-Match with 304
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
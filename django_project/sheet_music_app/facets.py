@@ -0,0 +1,78 @@
+"""
+Cached facet counts for the home() filter sidebar.
+
+Notes for future maintainers:
+- One GROUPING SETS query per visibility class ("public" for regular users,
+  "all" for internal users) counts every cast/season/use/year value at once.
+- Results are cached for SHEET_FACET_CACHE_SECONDS and dropped by the signal
+  handlers in signals.py whenever a Sheet or its tags change.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .caching import get_or_build
+from .models import Sheet
+
+FACET_CACHE_SECONDS = getattr(settings, "SHEET_FACET_CACHE_SECONDS", 3600)
+VISIBILITY_CLASSES = ("public", "all")
+
+# Facet name -> Sheet column, in the order used by the GROUPING SETS query
+FACET_COLUMNS = {"cast": "cast", "season": "season", "use": "use", "year": "publication_year"}
+
+
+def _cache_key(visibility):
+    return f"sheet_facets:{visibility}"
+
+
+def _count_values(visibility):
+    """Return ``{facet: {value: count}}`` using a single aggregate query."""
+    qn = connection.ops.quote_name
+    columns = [qn(column) for column in FACET_COLUMNS.values()]
+    where = f"WHERE {qn('public')}" if visibility == "public" else ""
+    sql = (
+        f"SELECT {', '.join(columns)}, GROUPING({', '.join(columns)}), COUNT(*) "
+        f"FROM {qn(Sheet._meta.db_table)} {where} "
+        f"GROUP BY GROUPING SETS ({', '.join(f'({c})' for c in columns)})"
+    )
+    # GROUPING() sets a bit for every column *not* in the row's grouping set,
+    # so exactly one bit is clear; map that bitmask back to its facet.
+    width = len(FACET_COLUMNS)
+    full = (1 << width) - 1
+    facet_by_grouping = {
+        full ^ (1 << (width - 1 - i)): (i, facet) for i, facet in enumerate(FACET_COLUMNS)
+    }
+
+    counts = {facet: {} for facet in FACET_COLUMNS}
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        for row in cursor.fetchall():
+            index, facet = facet_by_grouping[row[width]]
+            if row[index] is not None:
+                counts[facet][row[index]] = row[width + 1]
+    return counts
+
+
+def _build(visibility):
+    counts = _count_values(visibility)
+
+    def with_counts(choices, facet):
+        return [(code, label, counts[facet].get(code, 0)) for code, label in choices]
+
+    return {
+        "cast": with_counts(Sheet.CAST_CHOICES, "cast"),
+        "season": with_counts(Sheet.SEASON_CHOICES, "season"),
+        "use": with_counts(Sheet.USE_CHOICES, "use"),
+        # Only years that actually occur, oldest first
+        "year": [(year, year, n) for year, n in sorted(counts["year"].items())],
+    }
+
+
+def get_facets(visibility):
+    """Facet lists of ``(value, label, count)`` for one visibility class."""
+    return get_or_build(_cache_key(visibility), lambda: _build(visibility), FACET_CACHE_SECONDS)
+
+
+def invalidate_facets():
+    cache.delete_many([_cache_key(v) for v in VISIBILITY_CLASSES])
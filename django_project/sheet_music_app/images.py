@@ -0,0 +1,127 @@
+"""
+Resized WebP/JPEG derivatives of preview images for responsive ``srcset``.
+
+Notes for future maintainers:
+- Derivatives are stored under ``derivatives/<hash of source name>/`` in the
+  same storage as the source. A new upload always gets a new file name, so
+  changing the source automatically points at fresh derivatives.
+- Which widths exist for a source is recorded in the cache (no timeout), so
+  rendering a card never touches the filesystem after the first time.
+- Derivatives are built by the preview worker right after it renders a
+  preview, by ``manage.py build_image_derivatives``, or lazily the first time
+  an image is rendered without them.
+"""
+
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = "derivatives"
+DERIVATIVE_WIDTHS = tuple(getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", (320, 640, 1280)))
+# file extension -> Pillow format
+DERIVATIVE_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+QUALITY = getattr(settings, "IMAGE_DERIVATIVE_QUALITY", 80)
+
+
+def _folder(source_name):
+    digest = hashlib.sha1(source_name.encode()).hexdigest()[:16]
+    return posixpath.join(DERIVATIVE_DIR, digest)
+
+
+def derivative_name(source_name, width, ext):
+    return posixpath.join(_folder(source_name), f"{width}.{ext}")
+
+
+def _manifest_key(source_name):
+    return "img_derivs:" + hashlib.sha1(source_name.encode()).hexdigest()
+
+
+def _target_widths(source_width):
+    """Configured widths not larger than the source (never upscale).
+
+    When the source falls between two widths its own width is used as the top.
+    """
+    widths = [w for w in DERIVATIVE_WIDTHS if w < source_width]
+    return widths + [source_width] if len(widths) < len(DERIVATIVE_WIDTHS) else widths
+
+
+def build_derivatives(field_file):
+    """Generate missing derivatives for ``field_file``; return its manifest.
+
+    The manifest is ``{"widths": [...], "height": {width: height}}``.
+    """
+    storage = field_file.storage
+    with field_file.open("rb") as fh:
+        source = Image.open(fh)
+        source.load()
+    if source.mode not in ("RGB", "L"):
+        # JPEG has no alpha; flatten onto white like the card background
+        background = Image.new("RGB", source.size, "white")
+        background.paste(source, mask=source.convert("RGBA").split()[-1])
+        source = background
+
+    manifest = {"widths": [], "height": {}}
+    for width in _target_widths(source.width):
+        height = max(1, round(source.height * width / source.width))
+        resized = None
+        for ext, fmt in DERIVATIVE_FORMATS.items():
+            name = derivative_name(field_file.name, width, ext)
+            if storage.exists(name):
+                continue
+            if resized is None:
+                resized = source.resize((width, height), Image.LANCZOS)
+            buf = io.BytesIO()
+            resized.save(buf, fmt, quality=QUALITY, optimize=True)
+            storage.save(name, ContentFile(buf.getvalue()))
+        manifest["widths"].append(width)
+        manifest["height"][width] = height
+    cache.set(_manifest_key(field_file.name), manifest, None)
+    return manifest
+
+
+def get_manifest(field_file, build=True):
+    """Cached manifest for ``field_file``, building derivatives if needed.
+
+    Returns None when the source cannot be read as an image.
+    """
+    if not field_file:
+        return None
+    manifest = cache.get(_manifest_key(field_file.name))
+    if manifest is None and build:
+        try:
+            manifest = build_derivatives(field_file)
+        # OSError includes UnidentifiedImageError; an oversized image raises
+        # DecompressionBombError, which is not an OSError
+        except (OSError, Image.DecompressionBombError) as e:
+            logger.warning("Cannot build derivatives for %s: %s", field_file.name, e)
+            return None
+    return manifest
+
+
+def delete_derivatives(source_name, storage):
+    """Remove all derivatives of a (replaced or deleted) source image."""
+    folder = _folder(source_name)
+    try:
+        _, files = storage.listdir(folder)
+    except FileNotFoundError:
+        return
+    for name in files:
+        storage.delete(posixpath.join(folder, name))
+    cache.delete(_manifest_key(source_name))
+
+
+def derivative_url(field_file, width, ext):
+    return field_file.storage.url(derivative_name(field_file.name, width, ext))
+
+
+def srcset(field_file, manifest, ext):
+    """``srcset`` attribute value listing every width of one format."""
+    return ", ".join(f"{derivative_url(field_file, w, ext)} {w}w" for w in manifest["widths"])
@@ -0,0 +1,191 @@
+"""
+Bulk import of catalog manifests (CSV/JSON) plus a directory of sheet files.
+
+Notes for future maintainers:
+- ``manage.py import_sheets`` drives this module. Files are validated and
+  copied into content-addressed storage in a process pool (``store_file``
+  hashes while copying, so each file is read once); rows are then inserted
+  per batch with one tag resolution, in-memory slug allocation
+  (slugs.SlugAllocator), one ``bulk_create`` for sheets and one for their tag
+  links, all inside a transaction.
+- Imports are idempotent: a row whose stored file and title already exist as
+  a Sheet is skipped. Re-running an interrupted import therefore continues
+  where it stopped without duplicating rows (identical files are not stored
+  twice either).
+- ``bulk_create`` sends no signals, so ``import_batch`` performs what the
+  handlers in signals.py would: search vectors, facet cache, preview jobs,
+  sync feed entries.
+"""
+
+import csv
+import json
+import os
+
+from django.db import IntegrityError, transaction
+
+from .facets import invalidate_facets
+from .models import CatalogChange, PreviewJob, Sheet
+from .previews import is_pdf
+from .search import refresh_search_vectors
+from .slugs import SlugAllocator
+from .storage import sheet_storage
+from .sync import record_changes
+from .tagging import parse_tag_names, resolve_tags
+
+ALLOWED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg"}
+MAX_FILE_SIZE = 1024 * 1024 * 1024
+TEXT_FIELDS = ["title", "composer", "arranger", "publisher", "isbn", "description"]
+CHOICE_FIELDS = {
+    "cast": Sheet.CAST_CHOICES,
+    "season": Sheet.SEASON_CHOICES,
+    "use": Sheet.USE_CHOICES,
+}
+TRUE_VALUES = {"1", "true", "yes", "y", "ano", "a"}
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def read_manifest(path):
+    """Rows of a .csv, .json (array of objects) or .jsonl manifest."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        if ext == ".csv":
+            return list(csv.DictReader(fh))
+        if ext == ".json":
+            rows = json.load(fh)
+            if not isinstance(rows, list):
+                raise ManifestError("A JSON manifest must be an array of objects.")
+            return rows
+        if ext == ".jsonl":
+            return [json.loads(line) for line in fh if line.strip()]
+    raise ManifestError(f"Unsupported manifest type: {ext}")
+
+
+def _choice(field, value):
+    value = str(value or "").strip()
+    if not value:
+        return None
+    choices = CHOICE_FIELDS[field]
+    for code, label in choices:
+        # Accept the stored code ("CHRISTMAS") or the Czech label ("Vánoce")
+        if value == code or value.lower() == label.lower():
+            return code
+    raise ManifestError(f"unknown {field} {value!r}")
+
+
+def parse_row(raw):
+    """Validate one manifest row; return Sheet field values plus "file" and "tags"."""
+    row = {}
+    for field in TEXT_FIELDS:
+        value = str(raw.get(field) or "").strip() or None
+        max_length = Sheet._meta.get_field(field).max_length
+        if value and max_length and len(value) > max_length:
+            raise ManifestError(f"{field} is longer than {max_length} characters")
+        row[field] = value
+    if not row["title"] or not row["composer"]:
+        raise ManifestError("title and composer are required")
+    for field in CHOICE_FIELDS:
+        row[field] = _choice(field, raw.get(field))
+    year = str(raw.get("publication_year") or raw.get("year") or "").strip()
+    if year and not year.isdigit():
+        raise ManifestError(f"invalid publication_year {year!r}")
+    row["publication_year"] = int(year) if year else None
+    public = raw.get("public")
+    row["public"] = public is True or str(public or "").strip().lower() in TRUE_VALUES
+    row["tags"] = parse_tag_names(raw.get("tags") or "")
+    row["file"] = str(raw.get("file") or "").strip()
+    if not row["file"]:
+        raise ManifestError("file is required")
+    return row
+
+
+def store_file(path, dry_run=False):
+    """Validate ``path`` and store it; return ``(storage name, error)``.
+
+    Runs in worker processes. With ``dry_run`` only validates.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        return None, f"unsupported file type {ext or '(none)'}"
+    try:
+        size = os.path.getsize(path)
+        if not 0 < size <= MAX_FILE_SIZE:
+            return None, f"file size {size} out of range"
+        with open(path, "rb") as fh:
+            if ext == ".pdf" and fh.read(5) != b"%PDF-":
+                return None, "not a PDF file"
+            if dry_run:
+                return "", None
+            fh.seek(0)
+            return sheet_storage.save(os.path.basename(path), fh), None
+    except OSError as e:
+        return None, str(e)
+
+
+def existing_slugs():
+    return Sheet.objects.exclude(slug__isnull=True).exclude(slug="").values_list("slug", flat=True).iterator()
+
+
+def slug_allocator():
+    """SlugAllocator primed with every slug in the database (one query)."""
+    return SlugAllocator(existing_slugs())
+
+
+def import_batch(rows, user, slugs):
+    """Insert prepared ``rows`` (with "sheet_file" set); return the number created.
+
+    Rows whose (sheet_file, title) already exists are skipped.
+    """
+    existing = set(
+        Sheet.objects.filter(sheet_file__in={row["sheet_file"] for row in rows}).values_list("sheet_file", "title")
+    )
+    fresh = []
+    for row in rows:
+        key = (row["sheet_file"], row["title"])
+        if key not in existing:
+            existing.add(key)  # duplicates within the manifest too
+            fresh.append(row)
+    if not fresh:
+        return 0
+
+    tags = {tag.name.lower(): tag for tag in resolve_tags([name for row in fresh for name in row["tags"]])}
+    fields = TEXT_FIELDS + list(CHOICE_FIELDS) + ["publication_year", "public", "sheet_file"]
+    for attempt in range(2):
+        sheets = [
+            Sheet(
+                **{field: row[field] for field in fields},
+                slug=slugs.allocate(row["title"]),
+                created_by=user,
+                modified_by=user,
+            )
+            for row in fresh
+        ]
+        try:
+            with transaction.atomic():
+                Sheet.objects.bulk_create(sheets)
+                through = Sheet.tags.through
+                through.objects.bulk_create(
+                    [
+                        through(sheet_id=sheet.pk, tag_id=tags[name.lower()].pk)
+                        for sheet, row in zip(sheets, fresh)
+                        for name in row["tags"]
+                    ]
+                )
+                PreviewJob.objects.bulk_create(
+                    [PreviewJob(sheet=sheet) for sheet in sheets if is_pdf(sheet.sheet_file.name)]
+                )
+                record_changes(CatalogChange.SHEET, [sheet.pk for sheet in sheets])
+                # Tags now on a sheet become visible to public sync clients
+                record_changes(CatalogChange.TAG, [tags[name.lower()].pk for row in fresh for name in row["tags"]])
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+            # A concurrent editor took one of our slugs: re-read them and retry
+            slugs.reset(existing_slugs())
+
+    refresh_search_vectors([sheet.pk for sheet in sheets])
+    invalidate_facets()
+    return len(sheets)
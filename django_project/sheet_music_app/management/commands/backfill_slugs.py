@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from sheet_music_app.models import CatalogChange, Sheet
+from sheet_music_app.slugs import SlugAllocator
+from sheet_music_app.sync import record_changes
+
+
+class Command(BaseCommand):
+    help = "Generate slugs for all sheets that have none, in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, batch_size, **options):
+        missing = Sheet.objects.filter(Q(slug__isnull=True) | Q(slug="")).order_by("pk")
+        total = missing.count()
+        if not total:
+            self.stdout.write("All sheets already have a slug.")
+            return
+
+        # Read every existing slug once; allocation then happens in memory
+        # without per-row queries.
+        existing = Sheet.objects.exclude(Q(slug__isnull=True) | Q(slug=""))
+        slugs = SlugAllocator(existing.values_list("slug", flat=True).iterator())
+
+        done = 0
+        batch = []
+        for sheet in missing.only("pk", "title").iterator(chunk_size=batch_size):
+            sheet.slug = slugs.allocate(sheet.title)
+            batch.append(sheet)
+            if len(batch) >= batch_size:
+                done += self._write(batch)
+                batch = []
+                self.stdout.write(f"{done}/{total}")
+        if batch:
+            done += self._write(batch)
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {done} slugs."))
+
+    def _write(self, batch):
+        try:
+            with transaction.atomic():
+                Sheet.objects.bulk_update(batch, ["slug"])
+                record_changes(CatalogChange.SHEET, [sheet.pk for sheet in batch])
+        except IntegrityError:
+            # A concurrent writer took one of our slugs; fall back to save(),
+            # which re-allocates and retries per row.
+            for sheet in batch:
+                Sheet.objects.filter(pk=sheet.pk).update(slug=None)
+                sheet.slug = None
+                sheet.save(update_fields=["slug"])
+        return len(batch)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from PIL import Image
+
+from sheet_music_app.images import build_derivatives
+from sheet_music_app.models import Sheet
+
+
+class Command(BaseCommand):
+    help = "Build resized WebP/JPEG derivatives of every sheet preview image."
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        sheets = Sheet.objects.exclude(preview_image="").exclude(preview_image__isnull=True).only("pk", "preview_image")
+        for sheet in sheets.iterator():
+            try:
+                build_derivatives(sheet.preview_image)
+                built += 1
+            except (OSError, Image.DecompressionBombError) as e:
+                # Pillow's UnidentifiedImageError is an OSError too
+                self.stderr.write(f"Sheet {sheet.pk}: {e}")
+                failed += 1
+        self.stdout.write(f"Built derivatives for {built} previews, {failed} failed.")
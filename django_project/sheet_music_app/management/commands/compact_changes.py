@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from sheet_music_app.sync import compact_changes
+
+
+class Command(BaseCommand):
+    help = "Drop sync feed entries superseded by a newer entry for the same sheet or tag."
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"Removed {compact_changes()} superseded changes."))
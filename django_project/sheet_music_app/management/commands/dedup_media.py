@@ -0,0 +1,86 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from sheet_music_app.models import CatalogChange, Sheet
+from sheet_music_app.pages import delete_pages
+from sheet_music_app.storage import BLOB_DIR, is_blob, release_blob, sheet_storage
+from sheet_music_app.sync import record_changes
+
+
+class Command(BaseCommand):
+    help = "Move sheet files saved under their upload names into content-addressed blobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--prune", action="store_true",
+            help="Also delete blobs no sheet references (older than BLOB_GRACE_SECONDS).",
+        )
+
+    def handle(self, *args, dry_run, batch_size, prune, **options):
+        storage = sheet_storage
+        legacy = {}  # upload name -> blob name, each file is read once
+        sheets = []
+        rows = Sheet.objects.exclude(sheet_file="").only("pk", "sheet_file").order_by("pk")
+        for sheet in rows.iterator(chunk_size=batch_size):
+            name = sheet.sheet_file.name
+            if is_blob(name):
+                continue
+            if name not in legacy:
+                if not storage.exists(name):
+                    self.stderr.write(f"Sheet {sheet.pk}: {name} is missing, skipped.")
+                    continue
+                legacy[name] = None if dry_run else self._store(storage, name)
+            sheets.append((sheet, name))
+
+        if dry_run:
+            self.stdout.write(f"Would move {len(legacy)} files referenced by {len(sheets)} sheets.")
+            return
+
+        now = timezone.now()
+        for sheet, name in sheets:
+            sheet.sheet_file.name = legacy[name]
+            # New file URL: stale cached pages must not keep pointing at the old one
+            sheet.date_modified = now
+        with transaction.atomic():
+            Sheet.objects.bulk_update([s for s, _ in sheets], ["sheet_file", "date_modified"], batch_size=batch_size)
+            record_changes(CatalogChange.SHEET, [s.pk for s, _ in sheets])
+
+        freed = 0
+        for name in legacy:
+            still_used = Sheet.objects.filter(Q(sheet_file=name) | Q(preview_image=name)).exists()
+            if not still_used:
+                freed += storage.size(name)
+                storage.delete(name)
+        self.stdout.write(
+            f"Moved {len(legacy)} files ({len(set(legacy.values()))} distinct) for {len(sheets)} sheets, "
+            f"freed {freed / 1024 / 1024:.1f} MiB."
+        )
+        if prune:
+            self.stdout.write(f"Pruned {self._prune(storage)} unreferenced blobs.")
+
+    def _store(self, storage, name):
+        with storage.open(name, "rb") as fh:
+            return storage.save(os.path.basename(name), fh)
+
+    def _prune(self, storage):
+        pruned = 0
+        try:
+            shards, _ = storage.listdir(BLOB_DIR)
+        except FileNotFoundError:
+            return 0
+        for shard in shards:
+            if shard == "tmp":
+                continue
+            _, files = storage.listdir(f"{BLOB_DIR}/{shard}")
+            for filename in files:
+                name = f"{BLOB_DIR}/{shard}/{filename}"
+                if release_blob(name, storage):
+                    delete_pages(name)
+                    pruned += 1
+        return pruned
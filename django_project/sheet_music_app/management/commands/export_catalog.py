@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from sheet_music_app.exports import FORMATS, export_queryset, export_stream
+
+
+class Command(BaseCommand):
+    help = "Stream the catalog (CSV/JSONL metadata or a ZIP of the sheet files) to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--output", "-o", help="Target file (default: stdout).")
+        parser.add_argument("--public-only", action="store_true", help="Export only public sheets.")
+        # The same filters as the home page
+        parser.add_argument("--cast")
+        parser.add_argument("--season")
+        parser.add_argument("--use")
+        parser.add_argument("--year")
+        parser.add_argument("--q", help="Full-text search query.")
+        parser.add_argument("--ids", help="Comma separated sheet ids.")
+
+    def handle(self, *args, format, output, public_only, **options):
+        params = {key: options[key] for key in ("cast", "season", "use", "year", "q", "ids") if options[key]}
+        sheets = export_queryset("public" if public_only else "all", params)
+        target = open(output, "wb") if output else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in export_stream(format, sheets):
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if output:
+                target.close()
+        if output:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written / 1024 / 1024:.1f} MiB to {output}."))
@@ -0,0 +1,81 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from sheet_music_app.importer import ManifestError, import_batch, parse_row, read_manifest, slug_allocator, store_file
+
+
+class Command(BaseCommand):
+    help = "Import sheets from a CSV/JSON manifest and a directory of files (idempotent, resumable)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("manifest", help="CSV (header row), JSON array or JSONL file.")
+        parser.add_argument("files", help="Directory the manifest's file column is relative to.")
+        parser.add_argument("--user", help="Username recorded as creator (default: first superuser).")
+        parser.add_argument("--workers", type=int, default=None, help="File processes (default: CPU count).")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true", help="Validate manifest and files only.")
+
+    def handle(self, *args, manifest, files, user, workers, batch_size, dry_run, **options):
+        user = self._user(user)
+        try:
+            raw_rows = read_manifest(manifest)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read manifest: {e}")
+
+        rows, errors = [], 0
+        for number, raw in enumerate(raw_rows, start=1):
+            try:
+                row = parse_row(raw)
+            except ManifestError as e:
+                self.stderr.write(f"Row {number}: {e}")
+                errors += 1
+                continue
+            row["number"] = number
+            row["path"] = os.path.join(files, row["file"])
+            rows.append(row)
+
+        total = len(rows)
+        created = skipped = 0
+        started = time.monotonic()
+        slugs = slug_allocator()
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for offset in range(0, total, batch_size):
+                batch = rows[offset:offset + batch_size]
+                results = pool.map(partial(store_file, dry_run=dry_run), [row["path"] for row in batch], chunksize=8)
+                ready = []
+                for row, (name, error) in zip(batch, results):
+                    if error:
+                        self.stderr.write(f"Row {row['number']} ({row['file']}): {error}")
+                        errors += 1
+                    else:
+                        row["sheet_file"] = name
+                        ready.append(row)
+                if not dry_run:
+                    batch_created = import_batch(ready, user, slugs)
+                    created += batch_created
+                    skipped += len(ready) - batch_created
+                done = min(offset + batch_size, total)
+                rate = done / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(f"{done}/{total} rows ({rate:.0f}/s), {created} created, {skipped} already imported, {errors} errors")
+
+        summary = f"Created {created} sheets, skipped {skipped} already imported, {errors} errors."
+        self.stdout.write(self.style.SUCCESS(summary) if not errors else self.style.WARNING(summary))
+
+    def _user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {username!r}.")
+        user = User.objects.filter(is_superuser=True).order_by("pk").first()
+        if user is None:
+            raise CommandError("No superuser found; pass --user.")
+        return user
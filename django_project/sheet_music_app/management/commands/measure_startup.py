@@ -0,0 +1,46 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: the same work a gunicorn --preload master does
+# before forking (settings, app registry, URLconf, WSGI handler)
+PROBE = """
+import time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure how long a cold process takes to load the WSGI application."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--budget-ms", type=float, help="Fail when the median load time exceeds this.")
+
+    def handle(self, *args, runs, budget_ms, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        timings = []
+        for _ in range(max(1, runs)):
+            result = subprocess.run(
+                [sys.executable, "-c", PROBE], env=env, cwd=settings.BASE_DIR, capture_output=True, text=True
+            )
+            if result.returncode:
+                raise CommandError(f"Loading the application failed:\n{result.stderr}")
+            timings.append(float(result.stdout.strip().splitlines()[-1]))
+        median = statistics.median(timings)
+        self.stdout.write(
+            f"Application load ({'development' if settings.DEV else 'production'} profile, {len(timings)} runs): "
+            f"median {median:.0f} ms, min {min(timings):.0f} ms, max {max(timings):.0f} ms."
+        )
+        if budget_ms is not None and median > budget_ms:
+            raise CommandError(f"Startup budget exceeded: {median:.0f} ms > {budget_ms:.0f} ms.")
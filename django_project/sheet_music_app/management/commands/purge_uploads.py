@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sheet_music_app.models import ChunkedUpload
+from sheet_music_app.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads untouched for a while, with their partial files or unused blobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=24, help="Age after which an upload is abandoned.")
+
+    def handle(self, *args, hours, **options):
+        cutoff = timezone.now() - timedelta(hours=hours)
+        purged = 0
+        for upload in ChunkedUpload.objects.filter(updated_at__lt=cutoff).iterator():
+            discard_upload(upload)
+            purged += 1
+        self.stdout.write(f"Purged {purged} uploads older than {hours} h.")
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from sheet_music_app.models import PreviewJob, Sheet
+from sheet_music_app.pages import has_pages, page_name
+from sheet_music_app.previews import PREVIEW_DIR, is_pdf, queue_preview, run_pending
+from sheet_music_app.storage import BLOB_DIR, blob_digest, sheet_storage
+
+
+class Command(BaseCommand):
+    help = "Render queued sheet previews from the first PDF page (pdftoppm)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Parallel renders (default: CPU count).")
+        parser.add_argument("--watch", action="store_true", help="Keep polling the queue instead of exiting.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --watch.")
+        parser.add_argument(
+            "--backfill", action="store_true",
+            help="First queue every PDF sheet that has no preview image, or a generated one under a "
+            "guessable per-sheet name (previews/sheet-<pk>.png).",
+        )
+        parser.add_argument(
+            "--backfill-pages", action="store_true",
+            help="First queue every PDF sheet whose page images are missing.",
+        )
+
+    def handle(self, *args, workers, watch, interval, backfill, backfill_pages, **options):
+        if backfill:
+            self.stdout.write(f"Queued {self._backfill()} sheets for preview rendering.")
+        if backfill_pages:
+            self.stdout.write(f"Queued {self._backfill_pages()} sheets for page rendering.")
+        while True:
+            ok, failed = run_pending(workers=workers)
+            if ok or failed:
+                self.stdout.write(f"Rendered {ok} previews, {failed} failed.")
+            if not watch:
+                break
+            time.sleep(interval)
+
+    def _backfill(self):
+        missing = (
+            Sheet.objects.filter(
+                Q(preview_image="") | Q(preview_image__isnull=True) | Q(preview_image__startswith=f"{PREVIEW_DIR}/sheet-")
+            )
+            .exclude(preview_job__status__in=[PreviewJob.PENDING, PreviewJob.RUNNING])
+            .only("pk", "sheet_file", "preview_image")
+        )
+        queued = 0
+        for sheet in missing.iterator():
+            if is_pdf(sheet.sheet_file.name):
+                queue_preview(sheet)
+                queued += 1
+        return queued
+
+    def _backfill_pages(self):
+        sheets = (
+            Sheet.objects.filter(sheet_file__startswith=f"{BLOB_DIR}/")
+            .exclude(preview_job__status__in=[PreviewJob.PENDING, PreviewJob.RUNNING])
+            .only("pk", "sheet_file")
+        )
+        queued = 0
+        for sheet in sheets.iterator():
+            name = sheet.sheet_file.name
+            if has_pages(name) and not sheet_storage.exists(page_name(blob_digest(name), 1)):
+                queue_preview(sheet)
+                queued += 1
+        return queued
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sheet_music_app.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email over one SMTP connection, with retries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Messages claimed per round.")
+        parser.add_argument("--watch", action="store_true", help="Keep polling the outbox instead of exiting.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --watch.")
+
+    def handle(self, *args, batch_size, watch, interval, **options):
+        while True:
+            sent, failed = drain(batch_size=batch_size)
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+            if not watch:
+                break
+            time.sleep(interval)
@@ -0,0 +1,214 @@
+"""
+Per-request performance metrics: SQL, template and total time per view.
+
+Notes for future maintainers:
+- ``DBMetricsMiddleware`` (dbmetrics.py) opens a ``RequestTimings`` for every
+  request and its ``execute_wrapper`` times each query into it. Templates are
+  timed by the ``TimedDjangoTemplates`` backend (TEMPLATES in settings.py);
+  only the outermost render counts, so a template tag rendering another
+  template is not counted twice. Streamed responses are measured until the
+  view returns, not until the last chunk is sent.
+- Requests are labelled with the URL name (``resolver_match.view_name``, e.g.
+  ``home`` or ``admin:index``), never the path, so the number of series stays
+  bounded. Requests that resolve to no view (404s) share ``unresolved``.
+- Histograms live in the process, like the card cache and connection stats:
+  each gunicorn worker has its own and ``/metrics/`` (staff only, Prometheus
+  text format) shows the worker that answered. They restart at zero with the
+  worker.
+- Staff see a ``Server-Timing`` header (db, tpl, total) in the browser's
+  network panel. A request issuing more than REQUEST_QUERY_BUDGET queries is
+  logged with its slowest statements (0 turns the check off).
+"""
+
+import heapq
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET = getattr(settings, "REQUEST_QUERY_BUDGET", 50)
+SLOWEST_QUERIES = 3
+SQL_LOG_LENGTH = 500
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_current = ContextVar("request_timings", default=None)
+_lock = threading.Lock()
+
+
+class RequestTimings:
+    """What one request spent, filled in while it runs."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.rendering = False
+        self.slowest = []  # min-heap of (seconds, n, sql)
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        entry = (seconds, self.queries, sql)
+        if len(self.slowest) < SLOWEST_QUERIES:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def current_timings():
+    return _current.get()
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label value, rendered for Prometheus."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # view -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, view, value):
+        series = self.series.get(view)
+        if series is None:
+            series = self.series[view] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for view, series in sorted(self.series.items()):
+            label = _label(view)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{view="{label}",le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{view="{label}",le="+Inf"}} {series[-2]}')
+            lines.append(f'{self.name}_sum{{view="{label}"}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{view="{label}"}} {series[-2]}')
+        return lines
+
+
+HISTOGRAMS = {
+    "total": Histogram("sheetdb_request_duration_seconds", "Time spent in Django per request.", DURATION_BUCKETS),
+    "db": Histogram("sheetdb_request_db_seconds", "Time spent in SQL queries per request.", DURATION_BUCKETS),
+    "template": Histogram(
+        "sheetdb_request_template_seconds", "Time spent rendering templates per request.", DURATION_BUCKETS
+    ),
+    "queries": Histogram("sheetdb_request_queries", "SQL queries per request.", QUERY_BUCKETS),
+}
+responses = {}  # (view, status) -> count
+over_budget = {}  # view -> count
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match and match.view_name else "unresolved"
+
+
+def _is_staff(request):
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_staff)
+
+
+def server_timing(timings, total):
+    return (
+        f'db;dur={timings.sql_seconds * 1000:.1f};desc="{timings.queries} queries", '
+        f"tpl;dur={timings.template_seconds * 1000:.1f}, "
+        f"total;dur={total * 1000:.1f}"
+    )
+
+
+def finish_request(request, response, timings, token):
+    """Record the finished request; add Server-Timing for staff."""
+    _current.reset(token)
+    total = time.perf_counter() - timings.started
+    view = _view_name(request)
+    with _lock:
+        HISTOGRAMS["total"].observe(view, total)
+        HISTOGRAMS["db"].observe(view, timings.sql_seconds)
+        HISTOGRAMS["template"].observe(view, timings.template_seconds)
+        HISTOGRAMS["queries"].observe(view, timings.queries)
+        key = (view, response.status_code)
+        responses[key] = responses.get(key, 0) + 1
+        if QUERY_BUDGET and timings.queries > QUERY_BUDGET:
+            over_budget[view] = over_budget.get(view, 0) + 1
+    if QUERY_BUDGET and timings.queries > QUERY_BUDGET:
+        slowest = sorted(timings.slowest, reverse=True)
+        logger.warning(
+            "%s %s (%s) ran %d queries (budget %d) in %.1f ms of %.1f ms; slowest:\n%s",
+            request.method,
+            request.path,
+            view,
+            timings.queries,
+            QUERY_BUDGET,
+            timings.sql_seconds * 1000,
+            total * 1000,
+            "\n".join(f"  {seconds * 1000:.1f} ms: {sql[:SQL_LOG_LENGTH]}" for seconds, _, sql in slowest),
+        )
+    if _is_staff(request):
+        response["Server-Timing"] = server_timing(timings, total)
+    return response
+
+
+def render_prometheus():
+    """All metrics of this process in the Prometheus text exposition format."""
+    with _lock:
+        lines = []
+        for histogram in HISTOGRAMS.values():
+            lines.extend(histogram.render())
+        lines.append("# HELP sheetdb_responses_total Responses by view and status code.")
+        lines.append("# TYPE sheetdb_responses_total counter")
+        for (view, status), count in sorted(responses.items()):
+            lines.append(f'sheetdb_responses_total{{view="{_label(view)}",status="{status}"}} {count}')
+        lines.append("# HELP sheetdb_query_budget_exceeded_total Requests over REQUEST_QUERY_BUDGET queries.")
+        lines.append("# TYPE sheetdb_query_budget_exceeded_total counter")
+        for view, count in sorted(over_budget.items()):
+            lines.append(f'sheetdb_query_budget_exceeded_total{{view="{_label(view)}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None or timings.rendering:
+            return super().render(context, request)
+        timings.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_seconds += time.perf_counter() - start
+            timings.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend whose templates report their render time."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.25 on 2026-10-17 20:29
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+# Diacritic-insensitive text search configuration used by search.py.
+# PostgreSQL has no built-in Czech stemmer, so words are only lowercased
+# ("simple") after unaccent strips the diacritics.
+CREATE_SEARCH_CONFIG = """
+CREATE TEXT SEARCH CONFIGURATION sheet_search (COPY = pg_catalog.simple);
+ALTER TEXT SEARCH CONFIGURATION sheet_search
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+"""
+
+DROP_SEARCH_CONFIG = "DROP TEXT SEARCH CONFIGURATION IF EXISTS sheet_search;"
+
+# Same document as search.search_document(), for rows that already exist
+BACKFILL_SEARCH_VECTOR = """
+UPDATE sheet_music_app_sheet AS s SET search_vector =
+    setweight(to_tsvector('sheet_search', coalesce(s.title, '')), 'A')
+    || setweight(to_tsvector('sheet_search', coalesce(s.composer, '') || ' ' || coalesce(s.arranger, '')), 'B')
+    || setweight(to_tsvector('sheet_search', coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM sheet_music_app_sheet_tags st
+        JOIN sheet_music_app_tag t ON t.id = st.tag_id
+        WHERE st.sheet_id = s.id
+    ), '')), 'B')
+    || setweight(to_tsvector('sheet_search', coalesce(s.publisher, '') || ' ' || coalesce(s.isbn, '')), 'C')
+    || setweight(to_tsvector('sheet_search', coalesce(s.description, '')), 'D');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sheet_music_app', '0008_alter_sheet_cast_alter_sheet_season_alter_sheet_use'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.UnaccentExtension(),
+        migrations.RunSQL(CREATE_SEARCH_CONFIG, DROP_SEARCH_CONFIG),
+        migrations.AddField(
+            model_name='sheet',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='sheet',
+            name='cast',
+            field=models.CharField(blank=True, choices=[('SATB', 'SATB'), ('SSATB', 'SSATB'), ('SSAA', 'SSAA'), ('SSAB', 'SSAB'), ('SSA', 'SSA'), ('SAT', 'SAT'), ('SAB', 'SAB'), ('UNISON', 'Unisono'), ('OTHER', 'Jiné')], max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='sheet',
+            name='season',
+            field=models.CharField(blank=True, choices=[('ADVENT', 'Advent'), ('CHRISTMAS', 'Vánoce'), ('LENT', 'Půst'), ('EASTER', 'Velikonoce'), ('PENTECOST', 'Letnice'), ('HOLY_TRINITY', 'Nejsvětější Trojice'), ('INTERLUDE', 'Mezidobí'), ('OTHER', 'Žádné')], max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='sheet',
+            name='use',
+            field=models.CharField(blank=True, choices=[('HYMNS', 'Chvalozpěvy'), ('EUCHARIST', 'Eucharistie'), ('HOLY_SPIRIT', 'Duch Svatý'), ('VIRGIN_MARY', 'Panna Maria'), ('SAINTS', 'Svatí'), ('WEDDINGS', 'Svatební obřady'), ('FUNERAL', 'Pohřebí obřady'), ('FOLK', 'Lidové písně'), ('MINE', 'Hornické písně'), ('OTHER', 'Ostatní')], max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='sheet_search_vector_gin'),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTOR, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.25 on 2026-10-17 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sheet_music_app', '0009_sheet_search_vector'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='sheet',
+            options={'ordering': ['-date_created'], 'permissions': [('can_view_private', 'Can view private sheets')]},
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(fields=['title', 'id'], name='sheet_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(condition=models.Q(('public', True)), fields=['title', 'id'], name='sheet_public_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(fields=['cast', 'title', 'id'], name='sheet_cast_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(condition=models.Q(('public', True)), fields=['cast', 'title', 'id'], name='sheet_public_cast_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(fields=['season', 'title', 'id'], name='sheet_season_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(condition=models.Q(('public', True)), fields=['season', 'title', 'id'], name='sheet_public_season_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(fields=['use', 'title', 'id'], name='sheet_use_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(condition=models.Q(('public', True)), fields=['use', 'title', 'id'], name='sheet_public_use_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(fields=['publication_year', 'title', 'id'], name='sheet_year_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(condition=models.Q(('public', True)), fields=['publication_year', 'title', 'id'], name='sheet_public_year_idx'),
+        ),
+    ]
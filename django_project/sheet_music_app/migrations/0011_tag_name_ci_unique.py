@@ -0,0 +1,39 @@
+# Generated by Django 4.2.25 on 2026-10-17 20:35
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def merge_case_duplicate_tags(apps, schema_editor):
+    """Fold tags differing only by case into the oldest one before the
+    case-insensitive unique constraint is added."""
+    Tag = apps.get_model('sheet_music_app', 'Tag')
+    Through = apps.get_model('sheet_music_app', 'Sheet').tags.through
+    keep = {}
+    for tag in Tag.objects.order_by('id'):
+        key = tag.name.lower()
+        if key not in keep:
+            keep[key] = tag
+            continue
+        survivor = keep[key]
+        sheet_ids = Through.objects.filter(tag_id=tag.id).values_list('sheet_id', flat=True)
+        Through.objects.bulk_create(
+            [Through(sheet_id=sheet_id, tag_id=survivor.id) for sheet_id in sheet_ids],
+            ignore_conflicts=True,
+        )
+        tag.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sheet_music_app', '0010_sheet_meta_and_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicate_tags, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='tag_name_ci_unique'),
+        ),
+    ]
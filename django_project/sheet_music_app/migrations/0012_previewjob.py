@@ -0,0 +1,30 @@
+# Generated by Django 4.2.25 on 2026-10-17 20:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sheet_music_app', '0011_tag_name_ci_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PreviewJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('queued_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('sheet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='preview_job', to='sheet_music_app.sheet')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['queued_at'], name='previewjob_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.25 on 2026-10-17 20:40
+
+from django.db import migrations, models
+import sheet_music_app.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sheet_music_app', '0012_previewjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sheet',
+            name='sheet_file',
+            field=models.FileField(storage=sheet_music_app.storage.get_sheet_storage, upload_to=''),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.25 on 2026-10-17 20:54
+
+from django.db import migrations, models
+
+
+def seed_changes(apps, schema_editor):
+    """Start the feed with one entry per existing tag and sheet, so syncing
+    from 0 yields the whole catalog."""
+    CatalogChange = apps.get_model('sheet_music_app', 'CatalogChange')
+    for kind, model in (('tag', 'Tag'), ('sheet', 'Sheet')):
+        ids = apps.get_model('sheet_music_app', model).objects.order_by('id').values_list('id', flat=True)
+        CatalogChange.objects.bulk_create(
+            [CatalogChange(kind=kind, object_id=pk) for pk in ids.iterator()], batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sheet_music_app', '0015_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sheet', 'Sheet'), ('tag', 'Tag')], max_length=5)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='catalog_change_object_idx')],
+            },
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,16 @@
-from django.db import models
-from django.utils.text import slugify
+import uuid
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .slugs import base_slug, candidate_slugs, next_free_slug
+from .storage import get_sheet_storage
+
+# How often Sheet.save() re-allocates a slug lost to a concurrent insert
+SLUG_SAVE_ATTEMPTS = 5
 
 class Tag(models.Model):
     """Simple tag entity for labeling sheets."""
@@ -7,6 +18,11 @@ class Tag(models.Model):
 
     class Meta:
         ordering = ["name"]
+        constraints = [
+            # Tag names are unique regardless of case ("Advent" == "advent");
+            # tagging.resolve_tags looks tags up through this index.
+            models.UniqueConstraint(Lower("name"), name="tag_name_ci_unique"),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -73,36 +89,224 @@ class Sheet(models.Model):
     date_modified = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     modified_by = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='modified_sheets')
-    sheet_file = models.FileField()
+    # Stored once per distinct content, see storage.py
+    sheet_file = models.FileField(storage=get_sheet_storage)
     preview_image = models.ImageField(blank=True, null=True)
     public = models.BooleanField(default=False)
     slug = models.SlugField(max_length=255, unique=True, blank=True, null=True)
     # Tags are editor-managed and visible to all users
     tags = models.ManyToManyField(Tag, blank=True, related_name="sheets")
+    # Weighted full-text document maintained by search.refresh_search_vectors
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+
+    class Meta:
+        ordering = ['-date_created']
+        permissions = [
+            ("can_view_private", "Can view private sheets"),
+        ]
+        # The listing always orders by (title, id) and filters on at most a
+        # few of cast/season/use/publication_year. Each dimension gets a
+        # composite (dimension, title, id) index, plus a partial copy limited
+        # to public rows for regular users (see catalog.visible_sheets).
+        indexes = [
+            GinIndex(fields=["search_vector"], name="sheet_search_vector_gin"),
+            models.Index(fields=["title", "id"], name="sheet_title_idx"),
+            models.Index(fields=["title", "id"], name="sheet_public_title_idx", condition=models.Q(public=True)),
+            models.Index(fields=["cast", "title", "id"], name="sheet_cast_title_idx"),
+            models.Index(fields=["cast", "title", "id"], name="sheet_public_cast_idx", condition=models.Q(public=True)),
+            models.Index(fields=["season", "title", "id"], name="sheet_season_title_idx"),
+            models.Index(fields=["season", "title", "id"], name="sheet_public_season_idx", condition=models.Q(public=True)),
+            models.Index(fields=["use", "title", "id"], name="sheet_use_title_idx"),
+            models.Index(fields=["use", "title", "id"], name="sheet_public_use_idx", condition=models.Q(public=True)),
+            models.Index(fields=["publication_year", "title", "id"], name="sheet_year_title_idx"),
+            models.Index(fields=["publication_year", "title", "id"], name="sheet_public_year_idx", condition=models.Q(public=True)),
+        ]
     
     def __str__(self):
         return self.title
+
+    @property
+    def file_url(self):
+        """URL of sheet_file through the authorized download view."""
+        from .downloads import sheet_file_url
+
+        return sheet_file_url(self)
+
+    @property
+    def download_url(self):
+        from .downloads import sheet_file_url
+
+        return sheet_file_url(self, download=True)
     
     def save(self, *args, **kwargs):
         # Auto-generate slug from title if not set. Ensures uniqueness by suffixing
-        # "-2", "-3", ... when a collision is found.
-        if not self.slug and self.title:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            counter = 2
-            # Ensure uniqueness
-            while Sheet.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
-    
-# NOTE: This Meta class is currently at module scope, so its ordering will NOT apply
-# to the Sheet model. If you want default ordering on queries, indent this class so it
-# lives inside Sheet (as an inner class). Left unchanged here intentionally.
-class Meta:
-    ordering = ['-date_created'],
-    permissions = [
-        ("can_view_private", "Can view private sheets"),
+        # "-2", "-3", ... (see slugs.py). All taken candidates are read in one
+        # prefix query; a concurrent insert that grabs the same slug first makes
+        # the INSERT fail, in which case we re-allocate and retry.
+        if self.slug or not self.title:
+            return super().save(*args, **kwargs)
+        base = base_slug(self.title)
+        for attempt in range(SLUG_SAVE_ATTEMPTS):
+            taken = (
+                Sheet.objects.filter(candidate_slugs(base))
+                .exclude(pk=self.pk)
+                .values_list("slug", flat=True)
+            )
+            self.slug = next_free_slug(base, taken)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                conflict = Sheet.objects.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                self.slug = None
+                if not conflict or attempt == SLUG_SAVE_ATTEMPTS - 1:
+                    raise
+
+
+class PreviewJob(models.Model):
+    """Queued rendering of a sheet's first PDF page into its preview_image,
+    plus the page images of the detail page viewer (pages.py).
+
+    One row per sheet; re-uploading the file resets it to pending. Processed
+    outside the request cycle by ``manage.py render_previews`` (previews.py).
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    sheet = models.OneToOneField(Sheet, on_delete=models.CASCADE, related_name="preview_job")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    queued_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["queued_at"], name="previewjob_pending_idx", condition=models.Q(status="pending")),
+        ]
+
+    def __str__(self):
+        return f"Preview for sheet {self.sheet_id} ({self.status})"
+
+
+class ChunkedUpload(models.Model):
+    """A sheet file uploaded in fixed-size parts, see uploads.py.
+
+    Parts are appended to a file under CHUNKED_UPLOAD_ROOT until ``received``
+    reaches ``size``; completing moves it into content-addressed storage
+    (``blob_name``), after which add/edit sheet attach it by id.
+    """
+
+    OPEN = "open"
+    COMPLETE = "complete"
+    ATTACHED = "attached"
+    STATUS_CHOICES = [
+        (OPEN, "Open"),
+        (COMPLETE, "Complete"),
+        (ATTACHED, "Attached"),
     ]
 
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    # Optional whole-file checksum; every part is checked on its own as well
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    part_size = models.PositiveIntegerField()
+    received = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=OPEN)
+    blob_name = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size}, {self.status})"
+
+
+class OutboundEmail(models.Model):
+    """An email waiting in the outbox, see outbox.py.
+
+    Views never talk to SMTP: the OutboxBackend stores messages here and
+    ``manage.py send_outbox`` delivers them over one persistent connection,
+    retrying with backoff until the message is sent or dead-lettered.
+    """
+
+    QUEUED = "queued"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (DEAD, "Dead"),
+    ]
+
+    subject = models.TextField()
+    body = models.TextField(blank=True, default="")
+    from_email = models.CharField(max_length=254, blank=True, default="")
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    # [[content, mimetype], ...], e.g. the HTML part
+    alternatives = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a queued message is due; for a message being sent, when its claim expires
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                name="outbound_email_due_idx",
+                condition=models.Q(status__in=["queued", "sending"]),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class CatalogChange(models.Model):
+    """One entry of the delta sync feed (sync.py).
+
+    The auto-increment id is the change sequence clients sync from. Rows are
+    written by the signal handlers and bulk paths; a deleted sheet or tag
+    leaves a tombstone (``deleted=True``).
+    """
+
+    SHEET = "sheet"
+    TAG = "tag"
+    KIND_CHOICES = [
+        (SHEET, "Sheet"),
+        (TAG, "Tag"),
+    ]
+
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["kind", "object_id"], name="catalog_change_object_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} {self.object_id}{' deleted' if self.deleted else ''}"
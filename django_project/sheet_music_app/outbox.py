@@ -0,0 +1,181 @@
+"""
+Database-backed outbox for outgoing email.
+
+Notes for future maintainers:
+- EMAIL_BACKEND points at ``OutboxBackend``, so every ``send()`` in the
+  project (registration, Django's password reset, allauth) only inserts an
+  OutboundEmail row; no request ever waits on SMTP.
+- ``manage.py send_outbox`` claims due messages in batches
+  (SELECT ... FOR UPDATE SKIP LOCKED) and delivers them through
+  OUTBOX_DELIVERY_BACKEND over a single connection that stays open while
+  there is work. A failed message is retried with exponential backoff and
+  dead-lettered after OUTBOX_MAX_ATTEMPTS; it can be re-queued in the admin.
+- A claim is a lease: a worker that dies mid-batch leaves its messages in
+  "sending" until ``next_attempt_at`` passes, then another worker picks them
+  up again.
+- Messages with attachments are not queued; they are delivered right away.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def _setting(name, default):
+    # Read at call time so tests can override_settings()
+    return getattr(settings, name, default)
+
+
+def delivery_connection(**kwargs):
+    return get_connection(
+        _setting("OUTBOX_DELIVERY_BACKEND", "django.core.mail.backends.smtp.EmailBackend"), **kwargs
+    )
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Email backend that stores messages in the outbox instead of sending."""
+
+    def send_messages(self, email_messages):
+        queued = []
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            if message.attachments:
+                delivery_connection(fail_silently=self.fail_silently).send_messages([message])
+                continue
+            queued.append(
+                OutboundEmail(
+                    subject=message.subject,
+                    body=message.body,
+                    from_email=message.from_email or "",
+                    to=list(message.to),
+                    cc=list(message.cc),
+                    bcc=list(message.bcc),
+                    reply_to=list(message.reply_to),
+                    headers=dict(message.extra_headers),
+                    alternatives=[list(alt) for alt in getattr(message, "alternatives", [])],
+                )
+            )
+        OutboundEmail.objects.bulk_create(queued)
+        return len(queued)
+
+
+def to_message(row, connection=None):
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=row.from_email or None,
+        to=row.to,
+        cc=row.cc,
+        bcc=row.bcc,
+        reply_to=row.reply_to,
+        headers=row.headers,
+        connection=connection,
+    )
+    for content, mimetype in row.alternatives:
+        message.attach_alternative(content, mimetype)
+    return message
+
+
+def retry_delay(attempts):
+    """Backoff after the ``attempts``-th failure: 1, 2, 4, ... minutes, capped."""
+    base = _setting("OUTBOX_RETRY_BASE_SECONDS", 60)
+    cap = _setting("OUTBOX_RETRY_MAX_SECONDS", 6 * 3600)
+    return timedelta(seconds=min(cap, base * 2 ** (attempts - 1)))
+
+
+def claim_batch(limit):
+    """Lease up to ``limit`` due messages and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.filter(
+                status__in=[OutboundEmail.QUEUED, OutboundEmail.SENDING], next_attempt_at__lte=now
+            )
+            .order_by("next_attempt_at")
+            .select_for_update(skip_locked=True)
+            .values_list("pk", flat=True)[:limit]
+        )
+        OutboundEmail.objects.filter(pk__in=ids).update(
+            status=OutboundEmail.SENDING, next_attempt_at=now + CLAIM_LEASE, attempts=F("attempts") + 1
+        )
+    return list(OutboundEmail.objects.filter(pk__in=ids).order_by("pk"))
+
+
+def _failed(row, error):
+    max_attempts = _setting("OUTBOX_MAX_ATTEMPTS", 6)
+    row.last_error = str(error)[:2000]
+    if row.attempts >= max_attempts:
+        row.status = OutboundEmail.DEAD
+        logger.error("Email %s dead-lettered after %s attempts: %s", row.pk, row.attempts, error)
+    else:
+        row.status = OutboundEmail.QUEUED
+        row.next_attempt_at = timezone.now() + retry_delay(row.attempts)
+        logger.warning("Email %s failed (attempt %s): %s", row.pk, row.attempts, error)
+    row.save(update_fields=["status", "next_attempt_at", "last_error"])
+
+
+def _reconnect(connection):
+    # The session may be unusable after an error; start a fresh one so the
+    # rest of the batch still shares a single connection
+    try:
+        connection.close()
+        connection.open()
+    except Exception:
+        pass
+
+
+def send_batch(connection, rows):
+    """Deliver claimed ``rows`` over the open ``connection``; return (sent, failed)."""
+    sent = failed = 0
+    for row in rows:
+        try:
+            connection.send_messages([to_message(row, connection)])
+        except Exception as e:  # SMTP, socket and backend errors alike
+            _failed(row, e)
+            failed += 1
+            _reconnect(connection)
+            continue
+        row.status = OutboundEmail.SENT
+        row.sent_at = timezone.now()
+        row.last_error = ""
+        row.save(update_fields=["status", "sent_at", "last_error"])
+        sent += 1
+    return sent, failed
+
+
+def drain(batch_size=50):
+    """Send everything that is due over one connection; return (sent, failed)."""
+    sent = failed = 0
+    rows = claim_batch(batch_size)
+    if not rows:
+        return sent, failed
+    connection = delivery_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Relay unreachable: the whole batch is retried later
+        for row in rows:
+            _failed(row, e)
+        return 0, len(rows)
+    try:
+        while rows:
+            batch_sent, batch_failed = send_batch(connection, rows)
+            sent += batch_sent
+            failed += batch_failed
+            rows = claim_batch(batch_size)
+    finally:
+        connection.close()
+    return sent, failed
@@ -0,0 +1,98 @@
+"""
+Page images of sheet PDFs for the progressive viewer on the detail page.
+
+Notes for future maintainers:
+- Pages are rendered with pdftoppm (see previews.render_page) in grayscale at
+  SHEET_PAGE_WIDTH into ``pages/<xx>/<file digest>/<page>.png``. Keys are the
+  content hash of the PDF, so identical files share pages and a replaced file
+  never shows stale ones. Only content-addressed sheet files (storage.py)
+  get page images; other files fall back to the embedded PDF.
+- The preview worker renders all pages ahead of time. A page that is not
+  there yet is rendered on demand by the ``sheet_page`` view (one page, a
+  fraction of a second), so the viewer works right after an upload.
+- Page images are private like the PDF itself: nginx refuses /media/pages/
+  and they are delivered through ``sheet_page`` with X-Accel-Redirect.
+- Page counts come from pdfinfo and are cached without expiry per digest.
+"""
+
+import os
+import posixpath
+import re
+import shutil
+import subprocess
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .previews import PreviewError, RENDER_TIMEOUT, render_page
+from .storage import blob_digest, is_blob, sheet_storage
+
+PAGE_DIR = "pages"
+PAGE_WIDTH = getattr(settings, "SHEET_PAGE_WIDTH", 1200)
+PDFINFO = getattr(settings, "PDFINFO_BINARY", "pdfinfo")
+
+_PAGES_RE = re.compile(rb"^Pages:\s+(\d+)", re.MULTILINE)
+
+
+def has_pages(file_name):
+    """Whether page images can be offered for the stored sheet file."""
+    return is_blob(file_name) and file_name.lower().endswith(".pdf")
+
+
+def page_name(digest, number):
+    return posixpath.join(PAGE_DIR, digest[:2], digest, f"{number}.png")
+
+
+def page_count(file_name):
+    """Number of pages of the stored PDF ``file_name``, or None if unknown."""
+    if not has_pages(file_name):
+        return None
+    key = f"pdf_pages:{blob_digest(file_name)}"
+    count = cache.get(key)
+    if count is None:
+        if shutil.which(PDFINFO) is None:
+            raise PreviewError(f"{PDFINFO} not found (install poppler-utils)")
+        try:
+            result = subprocess.run(
+                [PDFINFO, sheet_storage.path(file_name)], check=True, capture_output=True, timeout=RENDER_TIMEOUT
+            )
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            raise PreviewError(f"pdfinfo failed: {e}") from e
+        match = _PAGES_RE.search(result.stdout)
+        if not match:
+            raise PreviewError("pdfinfo reported no page count")
+        count = int(match.group(1))
+        cache.set(key, count, None)
+    return count
+
+
+def ensure_page(file_name, number):
+    """Storage name of page ``number`` of ``file_name``, rendering it if missing."""
+    name = page_name(blob_digest(file_name), number)
+    full_path = sheet_storage.path(name)
+    if os.path.exists(full_path):
+        return name
+    png_path = render_page(sheet_storage.path(file_name), number, PAGE_WIDTH, gray=True)
+    try:
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Atomic: a concurrent render of the same page simply wins or loses
+        os.replace(png_path, full_path)
+    finally:
+        shutil.rmtree(os.path.dirname(png_path), ignore_errors=True)
+    return name
+
+
+def render_all_pages(file_name):
+    """Render every missing page of ``file_name``; return the page count."""
+    count = page_count(file_name) or 0
+    for number in range(1, count + 1):
+        ensure_page(file_name, number)
+    return count
+
+
+def delete_pages(file_name):
+    """Remove the page images of a sheet file that was deleted from storage."""
+    if has_pages(file_name):
+        digest = blob_digest(file_name)
+        shutil.rmtree(sheet_storage.path(posixpath.join(PAGE_DIR, digest[:2], digest)), ignore_errors=True)
+        cache.delete(f"pdf_pages:{digest}")
@@ -0,0 +1,170 @@
+"""
+Pagination helpers for the sheet listing.
+
+Notes for future maintainers:
+- KeysetPaginator pages by an ordered, unique key (``("title", "id")`` for the
+  listing) using opaque cursor tokens instead of OFFSET, so page N costs the
+  same single index range scan as page 1.
+- Neither paginator runs an exact COUNT(*) per request: totals come from
+  ``cached_count``, which keeps the result for SHEET_COUNT_CACHE_SECONDS.
+- Relevance-ranked search results keep numbered pages (CachedCountPaginator),
+  because a float rank does not round-trip reliably through a cursor.
+"""
+
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import models
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .caching import get_or_build
+
+COUNT_CACHE_SECONDS = getattr(settings, "SHEET_COUNT_CACHE_SECONDS", 300)
+
+
+def cached_count(queryset, timeout=COUNT_CACHE_SECONDS):
+    """Return ``queryset.count()``, cached by the SQL it would run."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.sha1(repr((sql, params)).encode()).hexdigest()
+    return get_or_build(f"sheet_count:{digest}", queryset.count, timeout)
+
+
+class CachedCountPaginator(Paginator):
+    """Django Paginator whose total comes from ``cached_count``."""
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({"k": list(values), "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return ``(values, direction)`` or ``(None, None)`` for a bad token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload["k"], payload["d"]
+    except (ValueError, TypeError, KeyError):
+        return None, None
+    if direction not in ("n", "p") or not isinstance(values, list):
+        return None, None
+    return values, direction
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator; iterable like a Paginator page."""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return f"<KeysetPage of {len(self)} items>"
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Cursor paginator over ``queryset`` ordered ascending by ``keys``.
+
+    The last key must be unique (normally ``"id"``) so every row has exactly
+    one position.
+    """
+
+    def __init__(self, queryset, per_page, keys=("title", "id")):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = tuple(keys)
+
+    @cached_property
+    def count(self):
+        return cached_count(self.queryset)
+
+    def _after(self, values, reverse=False):
+        """Q matching rows strictly after (or before) ``values`` in key order."""
+        op = "lt" if reverse else "gt"
+        condition = Q()
+        for i, key in enumerate(self.keys):
+            term = Q(**{f"{key}__{op}": values[i]})
+            for prev_key, prev_value in zip(self.keys[:i], values[:i]):
+                term &= Q(**{prev_key: prev_value})
+            condition |= term
+        # Leading-column bound so the planner can use a range scan on the index
+        bound = Q(**{f"{self.keys[0]}__{op}e": values[0]})
+        return bound & condition
+
+    def _valid_value(self, key, value):
+        """Whether a cursor value fits the column (cursors come from the client)."""
+        field = self.queryset.model._meta.get_field(key)
+        if isinstance(field, models.IntegerField):
+            return isinstance(value, int) and not isinstance(value, bool)
+        if isinstance(field, (models.CharField, models.TextField)):
+            return isinstance(value, str) and "\x00" not in value
+        return False
+
+    def _key_of(self, obj):
+        # Rows may be model instances or dicts from ``.values()``
+        if isinstance(obj, dict):
+            return [obj[key] for key in self.keys]
+        return [getattr(obj, key) for key in self.keys]
+
+    def get_page(self, cursor=None):
+        """Return the page addressed by ``cursor`` (first page when invalid)."""
+        values, direction = decode_cursor(cursor) if cursor else (None, None)
+        if values is not None and (
+            len(values) != len(self.keys)
+            or not all(self._valid_value(key, value) for key, value in zip(self.keys, values))
+        ):
+            values, direction = None, None
+
+        ordering = list(self.keys)
+        qs = self.queryset
+        if direction == "p":
+            qs = qs.filter(self._after(values, reverse=True))
+            ordering = [f"-{key}" for key in self.keys]
+        elif direction == "n":
+            qs = qs.filter(self._after(values))
+
+        rows = list(qs.order_by(*ordering)[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if direction == "p":
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows, self)
+
+        first, last = self._key_of(rows[0]), self._key_of(rows[-1])
+        if direction == "p":
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, direction == "n"
+        return KeysetPage(
+            rows,
+            self,
+            next_cursor=encode_cursor(last, "n") if has_next else None,
+            previous_cursor=encode_cursor(first, "p") if has_previous else None,
+        )
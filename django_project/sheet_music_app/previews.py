@@ -0,0 +1,248 @@
+"""
+Background rendering of sheet previews from the first PDF page (poppler).
+
+Notes for future maintainers:
+- Uploading a PDF only queues a PreviewJob (one upsert); the request never
+  waits on rendering. The job renders the preview and all page images for
+  the detail page viewer (pages.py). ``manage.py render_previews`` drains the queue with a
+  pool of threads, each driving its own ``pdftoppm`` process, so rendering
+  runs in parallel across cores.
+- Generated previews live under ``previews/<sha256 of the PNG>.png`` in media
+  storage. The name cannot be guessed from the sheet (previews of private
+  sheets are served by nginx like any media file) and never comes back with
+  different pixels, so cached copies and derivatives (images.py) stay valid.
+  Sheets with the same PDF share one preview file. A preview an editor
+  uploaded by hand is never overwritten; a generated one is replaced when
+  the PDF changes.
+- Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several workers
+  can run side by side. A claim is a lease: a job still RUNNING after
+  ``CLAIM_LEASE`` (its worker died or was killed) is claimed again, or marked
+  failed once it has used up its attempts.
+- A failing job never stops the worker: any error is logged and the job is
+  retried later. A job whose sheet was deleted meanwhile is simply done.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import images
+from .models import CatalogChange, PreviewJob, Sheet
+from .sync import record_changes
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_DIR = "previews"
+PREVIEW_WIDTH = getattr(settings, "SHEET_PREVIEW_WIDTH", 1024)
+RENDER_TIMEOUT = getattr(settings, "SHEET_PREVIEW_TIMEOUT", 60)
+MAX_ATTEMPTS = 3
+# Longer than rendering every page of a large score takes
+CLAIM_LEASE = timedelta(minutes=30)
+PDFTOPPM = getattr(settings, "PDFTOPPM_BINARY", "pdftoppm")
+
+
+class PreviewError(Exception):
+    pass
+
+
+def is_pdf(name):
+    return bool(name) and name.lower().endswith(".pdf")
+
+
+def has_generated_preview(sheet):
+    return bool(sheet.preview_image) and sheet.preview_image.name.startswith(f"{PREVIEW_DIR}/")
+
+
+def wants_generated_preview(sheet):
+    """PDF sheets without a hand-uploaded preview get one rendered."""
+    return is_pdf(sheet.sheet_file.name) and (not sheet.preview_image or has_generated_preview(sheet))
+
+
+def queue_preview_if_needed(sheet):
+    """Queue rendering after ``sheet``'s file was uploaded, when applicable.
+
+    Every PDF is queued: besides the preview, the worker renders the page
+    images of the detail page viewer (pages.py).
+    """
+    if is_pdf(sheet.sheet_file.name):
+        return queue_preview(sheet)
+    return None
+
+
+def queue_preview(sheet):
+    """Queue (or re-queue) rendering for ``sheet``. Cheap: one upsert."""
+    job, _ = PreviewJob.objects.update_or_create(
+        sheet=sheet,
+        defaults={
+            "status": PreviewJob.PENDING,
+            "attempts": 0,
+            "last_error": "",
+            "queued_at": timezone.now(),
+            "started_at": None,
+            "finished_at": None,
+        },
+    )
+    return job
+
+
+def render_page(pdf_path, page, width, gray=False):
+    """Render page ``page`` of ``pdf_path`` to a PNG; return its temp file path.
+
+    The caller removes the containing temp directory.
+    """
+    if shutil.which(PDFTOPPM) is None:
+        raise PreviewError(f"{PDFTOPPM} not found (install poppler-utils)")
+    out_dir = tempfile.mkdtemp(prefix="preview-")
+    prefix = os.path.join(out_dir, "page")
+    cmd = [PDFTOPPM, "-png", "-f", str(page), "-l", str(page), "-singlefile"]
+    if gray:
+        cmd.append("-gray")
+    cmd += ["-scale-to-x", str(width), "-scale-to-y", "-1", pdf_path, prefix]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, timeout=RENDER_TIMEOUT)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        stderr = getattr(e, "stderr", b"") or b""
+        raise PreviewError(f"pdftoppm failed: {stderr.decode(errors='replace').strip() or e}") from e
+    return prefix + ".png"
+
+
+def render_first_page(pdf_path, width=PREVIEW_WIDTH):
+    """Render page 1 of ``pdf_path`` to a PNG; return its temp file path."""
+    return render_page(pdf_path, 1, width)
+
+
+def _local_copy(field_file):
+    """Filesystem path of ``field_file``, copying it out of remote storage if needed."""
+    try:
+        return field_file.path, False
+    except NotImplementedError:
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as out, field_file.open("rb") as src:
+            shutil.copyfileobj(src, out)
+        return path, True
+
+
+def generate_preview(sheet):
+    """Render and attach a preview to ``sheet`` without touching other fields."""
+    pdf_path, is_temp = _local_copy(sheet.sheet_file)
+    try:
+        png_path = render_first_page(pdf_path)
+    finally:
+        if is_temp:
+            os.unlink(pdf_path)
+    try:
+        storage = sheet.preview_image.storage
+        with open(png_path, "rb") as fh:
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(chunk)
+            name = f"{PREVIEW_DIR}/{digest.hexdigest()}.png"
+            if not storage.exists(name):
+                fh.seek(0)
+                name = storage.save(name, File(fh))
+    finally:
+        shutil.rmtree(os.path.dirname(png_path), ignore_errors=True)
+
+    old_name = sheet.preview_image.name if has_generated_preview(sheet) else None
+    # update() rather than save(): the editor may have changed other fields
+    # meanwhile; bumping date_modified refreshes cached cards.
+    Sheet.objects.filter(pk=sheet.pk).update(preview_image=name, date_modified=timezone.now())
+    record_changes(CatalogChange.SHEET, [sheet.pk])
+    if old_name and old_name != name and not Sheet.objects.filter(preview_image=old_name).exists():
+        storage.delete(old_name)
+        images.delete_derivatives(old_name, storage)
+    # Build srcset derivatives now so the first listing render does not have to
+    sheet.preview_image.name = name
+    images.get_manifest(sheet.preview_image)
+    return name
+
+
+def claim_jobs(limit):
+    """Mark up to ``limit`` pending (or abandoned) jobs as running and return their ids."""
+    now = timezone.now()
+    with transaction.atomic():
+        abandoned = Q(status=PreviewJob.RUNNING, started_at__lt=now - CLAIM_LEASE)
+        # A job that keeps taking its worker down is not retried forever
+        PreviewJob.objects.filter(abandoned, attempts__gte=MAX_ATTEMPTS).update(
+            status=PreviewJob.FAILED, last_error="Abandoned by the worker.", finished_at=now
+        )
+        ids = list(
+            PreviewJob.objects.filter(Q(status=PreviewJob.PENDING) | abandoned)
+            .order_by("queued_at")
+            .select_for_update(skip_locked=True)
+            .values_list("pk", flat=True)[:limit]
+        )
+        PreviewJob.objects.filter(pk__in=ids).update(
+            status=PreviewJob.RUNNING, started_at=now, attempts=F("attempts") + 1
+        )
+    return ids
+
+
+def _retry_status(job):
+    return PreviewJob.FAILED if job.attempts >= MAX_ATTEMPTS else PreviewJob.PENDING
+
+
+def process_job(job_id):
+    """Render one claimed job; returns True on success. Thread-safe, never raises."""
+    try:
+        try:
+            job = PreviewJob.objects.select_related("sheet").get(pk=job_id)
+        except PreviewJob.DoesNotExist:
+            return True  # the sheet (and its job) was deleted meanwhile
+        sheet = job.sheet
+        status, error = PreviewJob.DONE, ""
+        try:
+            # Skip if an editor uploaded a preview by hand meanwhile
+            if wants_generated_preview(sheet):
+                generate_preview(sheet)
+            # Imported here: pages.py builds on this module
+            from .pages import has_pages, render_all_pages
+
+            if has_pages(sheet.sheet_file.name):
+                render_all_pages(sheet.sheet_file.name)
+        except (PreviewError, OSError, ValueError) as e:
+            logger.warning("Preview for sheet %s failed: %s", sheet.pk, e)
+            status, error = _retry_status(job), str(e)
+        except Exception as e:
+            logger.exception("Preview for sheet %s failed", sheet.pk)
+            status, error = _retry_status(job), f"{type(e).__name__}: {e}"
+        PreviewJob.objects.filter(pk=job.pk, status=PreviewJob.RUNNING).update(
+            status=status, last_error=error, finished_at=timezone.now()
+        )
+        return status == PreviewJob.DONE
+    except Exception:
+        # Database trouble; the lease hands the job to a later run
+        logger.exception("Preview job %s could not be processed", job_id)
+        return False
+    finally:
+        close_old_connections()
+
+
+def run_pending(workers=None, batch_size=None):
+    """Drain the queue once; return (succeeded, failed) counts."""
+    workers = workers or os.cpu_count() or 1
+    batch_size = batch_size or workers * 4
+    ok = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            ids = claim_jobs(batch_size)
+            if not ids:
+                break
+            for success in pool.map(process_job, ids):
+                if success:
+                    ok += 1
+                else:
+                    failed += 1
+    return ok, failed
@@ -0,0 +1,124 @@
+"""
+Request-scoped role resolution.
+
+Notes for future maintainers:
+- ``roles_for_user`` resolves is_editor / is_superuser / is_internal once and
+  memoises the result on the user object, which Django shares for the whole
+  request (request.user), so views and the ``permissions`` template filters
+  reuse it without further group queries. RolesMiddleware attaches it as
+  ``request.roles``.
+- Group names are additionally kept in the session, stamped with a role
+  version and a timestamp. Group membership changes bump the version (see
+  signals.py); the timestamp bounds staleness should the cache not be shared
+  between workers.
+"""
+
+import time
+
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from .caching import bump_namespace, namespace_version
+
+INTERNAL_GROUP = "Internal"
+ROLE_NAMESPACE = "roles"
+SESSION_KEY = "_sheet_roles"
+SESSION_TTL_SECONDS = getattr(settings, "ROLE_SESSION_TTL_SECONDS", 300)
+
+_USER_ATTR = "_sheet_roles"
+
+
+class Roles:
+    """Role flags of one user. Group names are loaded on first use only."""
+
+    def __init__(self, user, session=None):
+        self._user = user
+        self._session = session
+        self.is_authenticated = bool(getattr(user, "is_authenticated", False))
+        self.is_superuser = self.is_authenticated and user.is_superuser
+        self.is_editor = self.is_authenticated and (user.is_staff or user.is_superuser)
+
+    @cached_property
+    def groups(self):
+        if not self.is_authenticated:
+            return frozenset()
+        return _group_names(self._user, self._session)
+
+    @property
+    def is_internal(self):
+        return INTERNAL_GROUP in self.groups
+
+    @property
+    def can_view_private(self):
+        """Staff, superusers and the Internal group see private sheets."""
+        return self.is_editor or self.is_internal
+
+    @property
+    def viewer_role(self):
+        """Coarse role used as a cache dimension: editor, internal or public."""
+        if self.is_editor:
+            return "editor"
+        return "internal" if self.is_internal else "public"
+
+    def in_group(self, name):
+        return name in self.groups
+
+
+def role_version():
+    return namespace_version(ROLE_NAMESPACE)
+
+
+def bump_role_version():
+    bump_namespace(ROLE_NAMESPACE)
+
+
+def _group_names(user, session):
+    """Group names of ``user``, from the session stamp when still valid."""
+    version = role_version()
+    if session is not None:
+        stamp = session.get(SESSION_KEY)
+        if (
+            stamp
+            and stamp.get("uid") == user.pk
+            and stamp.get("v") == version
+            and time.time() - stamp.get("t", 0) < SESSION_TTL_SECONDS
+        ):
+            return frozenset(stamp["groups"])
+    groups = frozenset(user.groups.values_list("name", flat=True))
+    if session is not None:
+        session[SESSION_KEY] = {"uid": user.pk, "v": version, "t": time.time(), "groups": sorted(groups)}
+    return groups
+
+
+def roles_for_user(user, session=None):
+    """Roles of ``user``, memoised on the user object."""
+    roles = getattr(user, _USER_ATTR, None)
+    if roles is None:
+        roles = Roles(user, session)
+        try:
+            setattr(user, _USER_ATTR, roles)
+        except AttributeError:
+            pass  # e.g. AnonymousUser subclasses with __slots__
+    return roles
+
+
+def get_roles(request):
+    """Roles of ``request.user``, resolved at most once per request."""
+    roles = getattr(request, "roles", None)
+    if roles is None:
+        roles = request.roles = roles_for_user(request.user, getattr(request, "session", None))
+    return roles
+
+
+class RolesMiddleware:
+    """Attach ``request.roles`` (session-aware) before views and templates run.
+
+    Must come after AuthenticationMiddleware. Cheap: groups load lazily.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        get_roles(request)
+        return self.get_response(request)
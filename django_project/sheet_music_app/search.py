@@ -0,0 +1,91 @@
+"""
+Full-text search over the sheet catalog (PostgreSQL).
+
+Notes for future maintainers:
+- Every Sheet carries a precomputed, weighted ``search_vector`` (GIN indexed),
+  so a search is a single index lookup instead of seven ``icontains`` scans
+  plus a DISTINCT over the tag join.
+- Weights: title (A), composer/arranger/tags (B), publisher/isbn (C),
+  description (D).
+- The ``sheet_search`` text search configuration (see migration 0009) strips
+  diacritics via ``unaccent``, so "Vanoce" matches "Vánoce". PostgreSQL ships
+  no Czech stemmer, hence ``simple`` + ``unaccent`` rather than a language
+  config.
+- The vector is refreshed from signals (see signals.py). Code that bypasses
+  model signals (bulk_create, queryset.update) must call
+  ``refresh_search_vectors`` itself.
+"""
+
+import re
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+# Name of the PostgreSQL text search configuration created in migration 0009
+SEARCH_CONFIG = getattr(settings, "SHEET_SEARCH_CONFIG", "sheet_search")
+
+# Anything that is not a letter/digit could be a tsquery operator; drop it
+_TERM_SPLIT_RE = re.compile(r"[\W_]+")
+
+
+def _tag_names():
+    """Subquery returning the space-joined tag names of the outer sheet."""
+    from .models import Tag
+
+    names = (
+        Tag.objects.filter(sheets=OuterRef("pk"))
+        .values("sheets")
+        .annotate(names=StringAgg("name", delimiter=" "))
+        .values("names")
+    )
+    return Coalesce(Subquery(names), Value(""), output_field=TextField())
+
+
+def search_document():
+    """Weighted search document built from a Sheet row and its tags."""
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("composer", "arranger", weight="B", config=SEARCH_CONFIG)
+        + SearchVector(_tag_names(), weight="B", config=SEARCH_CONFIG)
+        + SearchVector("publisher", "isbn", weight="C", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="D", config=SEARCH_CONFIG)
+    )
+
+
+def refresh_search_vectors(sheet_ids=None):
+    """Recompute ``search_vector`` for the given sheet ids (all when None)."""
+    from .models import Sheet
+
+    sheets = Sheet.objects.all()
+    if sheet_ids is not None:
+        sheets = sheets.filter(pk__in=list(sheet_ids))
+    return sheets.update(search_vector=search_document())
+
+
+def build_query(q):
+    """Turn free user input into a prefix-matching tsquery, or None if empty.
+
+    Each word becomes a prefix term ("ave ver" -> "ave:* & ver:*") so partial
+    words keep matching the way the old ``icontains`` search did.
+    """
+    terms = [t for t in _TERM_SPLIT_RE.split(q) if t]
+    if not terms:
+        return None
+    raw = " & ".join(f"{t}:*" for t in terms)
+    return SearchQuery(raw, search_type="raw", config=SEARCH_CONFIG)
+
+
+def search_sheets(queryset, q):
+    """Filter ``queryset`` by ``q`` and order the matches by relevance."""
+    query = build_query(q)
+    if query is None:
+        # Input was only punctuation; nothing to search for
+        return queryset
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "title", "id")
+    )
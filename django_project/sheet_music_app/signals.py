@@ -0,0 +1,159 @@
+"""
+Signal handlers keeping derived data in sync with Sheet/Tag writes.
+
+Connected in SheetMusicAppConfig.ready().
+"""
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from django.utils import timezone
+
+from .auth import forget_user
+from .cards import bump_tag_version
+from .facets import invalidate_facets
+from .models import CatalogChange, Sheet, Tag
+from .pages import delete_pages
+from .roles import bump_role_version
+from .search import refresh_search_vectors
+from .storage import release_blob
+from .sync import record_changes
+
+
+@receiver(post_init, sender=Sheet)
+def sheet_loaded(sender, instance, **kwargs):
+    # Remember the stored file so a replaced blob can be released on save
+    value = instance.__dict__.get("sheet_file")  # absent when deferred
+    instance._loaded_sheet_file = getattr(value, "name", value)
+    instance._loaded_public = instance.__dict__.get("public")
+
+
+def _record_sheet_tags(sheet_ids):
+    # Which tags a public client may see depends on the public sheets carrying them
+    tag_ids = Sheet.tags.through.objects.filter(sheet_id__in=list(sheet_ids)).values_list("tag_id", flat=True)
+    record_changes(CatalogChange.TAG, tag_ids)
+
+
+def _release_blob(name):
+    if release_blob(name):
+        delete_pages(name)
+
+
+def _release_blob_on_commit(name):
+    if name:
+        transaction.on_commit(lambda: _release_blob(name))
+
+
+@receiver(post_save, sender=Sheet)
+def sheet_saved(sender, instance, raw=False, **kwargs):
+    invalidate_facets()
+    if raw:
+        return
+    old_name = getattr(instance, "_loaded_sheet_file", None)
+    if "sheet_file" in instance.__dict__ and old_name != instance.sheet_file.name:
+        _release_blob_on_commit(old_name)
+        instance._loaded_sheet_file = instance.sheet_file.name
+    refresh_search_vectors([instance.pk])
+    record_changes(CatalogChange.SHEET, [instance.pk])
+    old_public = getattr(instance, "_loaded_public", None)
+    if "public" in instance.__dict__ and old_public is not None and old_public != instance.public:
+        _record_sheet_tags([instance.pk])
+    instance._loaded_public = instance.__dict__.get("public")
+
+
+@receiver(pre_delete, sender=Sheet)
+def sheet_deleting(sender, instance, **kwargs):
+    # The tag rows go with the sheet, without m2m_changed
+    instance._deleted_tag_ids = list(instance.tags.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Sheet)
+def sheet_deleted(sender, instance, **kwargs):
+    invalidate_facets()
+    record_changes(CatalogChange.SHEET, [instance.pk], deleted=True)
+    record_changes(CatalogChange.TAG, getattr(instance, "_deleted_tag_ids", []))
+    if "sheet_file" in instance.__dict__:
+        _release_blob_on_commit(instance.sheet_file.name)
+
+
+@receiver(m2m_changed, sender=Sheet.tags.through)
+def sheet_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # Remember the affected sheets (tag.sheets.clear()) or tags
+        # (sheet.tags.clear()) before the rows go
+        if reverse:
+            instance._cleared_sheet_ids = list(instance.sheets.values_list("pk", flat=True))
+        else:
+            instance._cleared_tag_ids = list(instance.tags.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    invalidate_facets()
+    if not reverse:
+        sheet_ids = [instance.pk]
+        tag_ids = getattr(instance, "_cleared_tag_ids", []) if action == "post_clear" else pk_set or []
+    elif action == "post_clear":
+        sheet_ids = getattr(instance, "_cleared_sheet_ids", [])
+        tag_ids = [instance.pk]
+    else:
+        sheet_ids = pk_set or []
+        tag_ids = [instance.pk]
+    # A tag becomes visible to public sync clients once it is on a public sheet
+    # (sync._visible_tags), and hidden again when it leaves the last one
+    record_changes(CatalogChange.TAG, tag_ids)
+    if sheet_ids:
+        # Changing tags counts as modifying the sheet (new card cache key)
+        Sheet.objects.filter(pk__in=list(sheet_ids)).update(date_modified=timezone.now())
+        refresh_search_vectors(sheet_ids)
+        record_changes(CatalogChange.SHEET, sheet_ids)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    record_changes(CatalogChange.TAG, [instance.pk])
+    if created:
+        return
+    # A renamed tag changes the search document and cards of every sheet carrying it
+    bump_tag_version()
+    sheet_ids = list(instance.sheets.values_list("pk", flat=True))
+    refresh_search_vectors(sheet_ids)
+    record_changes(CatalogChange.SHEET, sheet_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    instance._deleted_sheet_ids = list(instance.sheets.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    bump_tag_version()
+    record_changes(CatalogChange.TAG, [instance.pk], deleted=True)
+    sheet_ids = getattr(instance, "_deleted_sheet_ids", [])
+    if sheet_ids:
+        refresh_search_vectors(sheet_ids)
+        record_changes(CatalogChange.SHEET, sheet_ids)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, action, **kwargs):
+    # Invalidate role stamps cached in sessions (roles.py)
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_role_version()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Cached for request.user by the auth backends (auth.py)
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    bump_role_version()
@@ -0,0 +1,77 @@
+"""
+Slug allocation for Sheet.
+
+Slugs are ``slugify(title)`` with "-2", "-3", ... appended on collision.
+Instead of probing candidates one query at a time, callers fetch every taken
+slug sharing the base in one prefix query (served by the slug column's
+pattern index) and pick the lowest free suffix in memory.
+"""
+
+import re
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+SLUG_MAX_LENGTH = 255
+# Room left for a "-<n>" suffix when the title is very long
+_BASE_MAX_LENGTH = SLUG_MAX_LENGTH - 10
+FALLBACK_BASE = "noty"
+_SUFFIX_RE = re.compile(r"^(.*)-(\d+)$")
+
+
+def base_slug(title):
+    return slugify(title)[:_BASE_MAX_LENGTH].strip("-") or FALLBACK_BASE
+
+
+def candidate_slugs(base):
+    """Q matching ``base`` and every slug that could be ``base-<n>``."""
+    return Q(slug=base) | Q(slug__startswith=f"{base}-")
+
+
+def next_free_slug(base, taken):
+    """Lowest of base, base-2, base-3, ... not in ``taken``."""
+    pattern = re.compile(rf"^{re.escape(base)}-(\d+)$")
+    used = set()
+    for slug in taken:
+        if slug == base:
+            used.add(1)
+        else:
+            match = pattern.match(slug or "")
+            if match:
+                used.add(int(match.group(1)))
+    if 1 not in used:
+        return base
+    n = 2
+    while n in used:
+        n += 1
+    return f"{base}-{n}"
+
+
+class SlugAllocator:
+    """Allocates slugs for many new rows after reading existing slugs once.
+
+    Every taken slug is indexed by the base it could have been generated from
+    ("ave-maria-3" -> "ave-maria"), so ``allocate`` needs no queries. Used by
+    bulk commands (backfill_slugs, import_sheets).
+    """
+
+    def __init__(self, existing_slugs):
+        self.reset(existing_slugs)
+
+    def reset(self, existing_slugs):
+        self.taken = defaultdict(set)
+        for slug in existing_slugs:
+            self.add(slug)
+
+    def add(self, slug):
+        self.taken[slug].add(slug)
+        match = _SUFFIX_RE.match(slug)
+        if match:
+            self.taken[match.group(1)].add(slug)
+
+    def allocate(self, title):
+        base = base_slug(title)
+        slug = next_free_slug(base, self.taken[base])
+        self.add(slug)
+        return slug
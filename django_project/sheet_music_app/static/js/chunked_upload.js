@@ -0,0 +1,131 @@
+// Chunked, resumable upload of the sheet file (see uploads.py).
+// Forms marked with data-chunked-upload upload the selected sheet_file in
+// parts before submitting, then post only the upload id ("upload_id").
+// An interrupted upload resumes from the last stored part when the form is
+// submitted again with the same file.
+(function () {
+    var MAX_RETRIES = 5;
+
+    function csrfToken(form) {
+        return form.querySelector('input[name="csrfmiddlewaretoken"]').value;
+    }
+
+    function request(method, url, form, body, headers) {
+        headers = Object.assign({ 'X-CSRFToken': csrfToken(form) }, headers || {});
+        return fetch(url, { method: method, body: body, headers: headers, credentials: 'same-origin' })
+            .then(function (response) {
+                return response.json().then(function (data) {
+                    if (!response.ok) {
+                        var error = new Error(data.error || response.statusText);
+                        error.status = response.status;
+                        throw error;
+                    }
+                    return data;
+                });
+            });
+    }
+
+    function sha256Hex(buffer) {
+        return crypto.subtle.digest('SHA-256', buffer).then(function (hash) {
+            return Array.from(new Uint8Array(hash)).map(function (b) {
+                return b.toString(16).padStart(2, '0');
+            }).join('');
+        });
+    }
+
+    function withRetry(fn) {
+        var attempt = 0;
+        function run() {
+            return fn().catch(function (error) {
+                // Client errors will not fix themselves; network errors and 5xx may
+                if (error.status && error.status < 500 || ++attempt > MAX_RETRIES) {
+                    throw error;
+                }
+                return new Promise(function (resolve) {
+                    setTimeout(resolve, 1000 * Math.pow(2, attempt));
+                }).then(run);
+            });
+        }
+        return run();
+    }
+
+    function startOrResume(form, file) {
+        var base = form.dataset.chunkedUpload;
+        var key = 'chunked-upload:' + [file.name, file.size, file.lastModified].join(':');
+        var known = localStorage.getItem(key);
+        var state = known
+            ? request('GET', base + known, form).catch(function () { return null; })
+            : Promise.resolve(null);
+        return state.then(function (upload) {
+            if (upload && upload.status === 'open') {
+                return upload;
+            }
+            return request('POST', base, form, JSON.stringify({ filename: file.name, size: file.size }), {
+                'Content-Type': 'application/json'
+            }).then(function (created) {
+                localStorage.setItem(key, created.id);
+                return created;
+            });
+        }).then(function (upload) {
+            return { upload: upload, key: key };
+        });
+    }
+
+    function sendParts(form, file, upload, progress) {
+        var base = form.dataset.chunkedUpload + upload.id;
+        var parts = Math.ceil(upload.size / upload.part_size);
+        function send(index) {
+            // Every byte has arrived (the last part may be short)
+            if (index >= parts || upload.received === upload.size) {
+                return request('POST', base + '/complete', form);
+            }
+            var blob = file.slice(index * upload.part_size, (index + 1) * upload.part_size);
+            return blob.arrayBuffer().then(sha256Hex).then(function (digest) {
+                return withRetry(function () {
+                    return request('PUT', base + '/parts/' + index, form, blob, {
+                        'Content-Type': 'application/octet-stream',
+                        'X-Part-SHA256': digest
+                    });
+                });
+            }).then(function (state) {
+                upload = state;
+                progress(state.received / state.size);
+                return send(state.next_part);
+            });
+        }
+        return send(upload.next_part);
+    }
+
+    document.querySelectorAll('form[data-chunked-upload]').forEach(function (form) {
+        var input = form.querySelector('input[name="sheet_file"]');
+        var status = form.querySelector('.chunked-upload-status');
+        form.addEventListener('submit', function (event) {
+            var file = input.files[0];
+            if (!file || form.querySelector('input[name="upload_id"]')) {
+                return;
+            }
+            event.preventDefault();
+            var submit = form.querySelector('[type="submit"]');
+            submit.disabled = true;
+            status.textContent = 'Nahrávám soubor…';
+            startOrResume(form, file).then(function (started) {
+                return sendParts(form, file, started.upload, function (ratio) {
+                    status.textContent = 'Nahráno ' + Math.floor(ratio * 100) + ' %';
+                }).then(function (upload) {
+                    localStorage.removeItem(started.key);
+                    var hidden = document.createElement('input');
+                    hidden.type = 'hidden';
+                    hidden.name = 'upload_id';
+                    hidden.value = upload.id;
+                    form.appendChild(hidden);
+                    // The file is on the server already; do not send it again
+                    input.disabled = true;
+                    form.submit();
+                });
+            }).catch(function (error) {
+                status.textContent = 'Nahrávání se nezdařilo (' + error.message + '). Odešlete formulář znovu, nahrávání bude pokračovat.';
+                submit.disabled = false;
+            });
+        });
+    });
+})();
@@ -0,0 +1,53 @@
+"""
+Static file storages producing content-hashed, precompressed assets.
+
+Notes for future maintainers:
+- ``collectstatic`` (STORAGES["staticfiles"]) writes every file also under a
+  content-hashed name (``style.3f2a9c1b7d4e.css``) and a manifest that
+  ``{% static %}`` resolves through; django-compressor's ``manage.py compress``
+  (COMPRESS_STORAGE) writes the compiled SCSS and minified CSS/JS bundles
+  as ``CACHE/css/output.<hash>.css``. Hashed names never change content, so
+  nginx serves them with a one year ``immutable`` Cache-Control.
+- Both storages leave a ``.gz`` next to each compressible file for nginx's
+  ``gzip_static``, so nothing is compressed per request. No ``.br`` files:
+  the stock nginx image has no brotli module to serve them.
+"""
+
+import gzip
+import os
+
+from compressor.storage import CompressorFileStorage
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".map", ".txt", ".xml", ".html", ".ico", ".ttf", ".eot"}
+# Below this gzip's framing outweighs the savings
+MIN_SIZE = 256
+
+
+def write_precompressed(path):
+    """Write ``path.gz`` next to ``path`` if that saves bytes."""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return
+    with open(path, "rb") as fh:
+        data = fh.read()
+    if len(data) < MIN_SIZE:
+        return
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        with open(path + ".gz", "wb") as fh:
+            fh.write(compressed)
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and hashed_name and not isinstance(processed, Exception):
+                write_precompressed(self.path(hashed_name))
+            yield name, hashed_name, processed
+
+
+class PrecompressedCompressorFileStorage(CompressorFileStorage):
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        write_precompressed(self.path(name))
+        return name
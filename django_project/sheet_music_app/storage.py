@@ -0,0 +1,126 @@
+"""
+Content-addressed storage for sheet files.
+
+Notes for future maintainers:
+- Uploads are hashed (SHA-256) while they are copied into a temp file, so
+  the content is read exactly once. The blob is then stored as
+  ``blobs/<2 hex>/<digest><ext>``; identical uploads resolve to the same name
+  and are kept once, whatever the original file name was.
+- Blobs are never served from ``/media/blobs/`` (nginx answers 404 there).
+  downloads.py checks the sheet's visibility and hands the file to nginx
+  through the internal ``/protected-media/`` location (X-Accel-Redirect).
+  Blob names never change content, so download URLs carry the digest
+  (``?v=``) and such responses are cached privately and immutably for a year.
+- A blob may be shared by several Sheet rows. ``release_blob`` deletes it
+  only when no row references it any more (the reference count is the number
+  of rows pointing at the name, so it can never drift). Blobs touched within
+  the last BLOB_GRACE_SECONDS are kept, which covers an upload of the same
+  content whose Sheet row is not committed yet.
+- ``manage.py dedup_media`` moves files saved before this backend into blobs.
+"""
+
+import hashlib
+import os
+import posixpath
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+BLOB_DIR = "blobs"
+BLOB_GRACE_SECONDS = getattr(settings, "BLOB_GRACE_SECONDS", 3600)
+
+
+def blob_name(digest, ext):
+    return posixpath.join(BLOB_DIR, digest[:2], digest + ext.lower())
+
+
+def blob_digest(name):
+    """SHA-256 hex digest encoded in blob ``name``."""
+    return posixpath.splitext(posixpath.basename(name))[0]
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_DIR + "/")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by the SHA-256 of their content."""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is decided by the content in _save()
+        return name
+
+    def _save(self, name, content):
+        tmp_dir = self.path(posixpath.join(BLOB_DIR, "tmp"))
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    out.write(chunk)
+            return self._commit(tmp_path, digest.hexdigest(), os.path.splitext(name)[1])
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def adopt(self, path, ext, expected_digest=None):
+        """Move the local file ``path`` into the store without copying it.
+
+        ``path`` must be on the same filesystem as the storage location.
+        Returns the blob name; raises ValueError (leaving ``path`` alone) if
+        the content does not match ``expected_digest``.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(chunk)
+        if expected_digest and digest.hexdigest() != expected_digest.lower():
+            raise ValueError("SHA-256 mismatch")
+        return self._commit(path, digest.hexdigest(), ext)
+
+    def _commit(self, path, hexdigest, ext):
+        name = blob_name(hexdigest, ext)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.unlink(path)
+            # Restart the grace period so a concurrent release keeps it
+            os.utime(full_path)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+            os.replace(path, full_path)
+        return name
+
+
+sheet_storage = ContentAddressedStorage()
+
+
+def get_sheet_storage():
+    """Storage of Sheet.sheet_file (callable so migrations stay stable)."""
+    return sheet_storage
+
+
+def blob_refcount(name):
+    from .models import Sheet
+
+    return Sheet.objects.filter(sheet_file=name).count()
+
+
+def release_blob(name, storage=None):
+    """Delete blob ``name`` if no Sheet references it; return True if deleted."""
+    storage = storage or sheet_storage
+    if not is_blob(name) or blob_refcount(name):
+        return False
+    try:
+        if time.time() - os.path.getmtime(storage.path(name)) < BLOB_GRACE_SECONDS:
+            return False
+    except FileNotFoundError:
+        return False
+    storage.delete(name)
+    return True
@@ -0,0 +1,120 @@
+"""
+Delta sync feed for clients that mirror the catalog (``/api/changes``).
+
+Notes for future maintainers:
+- Every write to a Sheet or Tag appends a CatalogChange row (signals.py and
+  the bulk paths: importer.py, tagging.resolve_tags, dedup_media,
+  backfill_slugs). Deletions leave tombstones, so hard deletes are visible to
+  clients. A tag rename or deletion also records the sheets carrying it,
+  because their ``tags`` changed.
+- The row id is the sync token. ``record_changes`` holds a transaction-level
+  advisory lock while inserting, so ids become visible in commit order and a
+  client that has seen id N can never miss a smaller id committed later.
+  This serializes catalog writes for the short rest of the transaction,
+  which is fine at the catalog's write rate.
+- A feed page reads at most ``limit`` log rows after the token, collapses them
+  per object and fetches the current state of what changed, in one query per
+  kind (api.serialize, same fields as ``/api/sheets``). Sheets a client may not
+  see (e.g. switched to private) are reported as deleted for it.
+- ``manage.py compact_changes`` drops log rows superseded by a newer row for
+  the same object; the feed stays correct for every token, only shorter.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .api import ApiError, parse_fields, parse_limit, serialize, sheet_columns
+from .catalog import sheets_for_visibility
+from .models import CatalogChange, Tag
+
+# Arbitrary constant identifying the feed's pg_advisory_xact_lock
+ADVISORY_LOCK_ID = 0x5EE7C4A9
+
+
+def record_changes(kind, object_ids, deleted=False):
+    """Append feed entries for ``object_ids`` of ``kind`` (CatalogChange.SHEET/TAG)."""
+    object_ids = sorted(set(object_ids))
+    if not object_ids:
+        return
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ADVISORY_LOCK_ID])
+        CatalogChange.objects.bulk_create(
+            [CatalogChange(kind=kind, object_id=pk, deleted=deleted) for pk in object_ids]
+        )
+
+
+def parse_token(value):
+    """The change id a client has seen; 0 (full sync) when absent."""
+    value = (value or "0").strip()
+    if not value.isdigit():
+        raise ApiError("Invalid token.")
+    return int(value)
+
+
+def _visible_tags(visibility, tag_ids):
+    tags = Tag.objects.filter(pk__in=tag_ids)
+    if visibility == "public":
+        # Tags used only on private sheets are not disclosed (as in api.list_tags)
+        tags = tags.annotate(public_sheets=Count("sheets", filter=Q(sheets__public=True))).filter(
+            public_sheets__gt=0
+        )
+    return list(tags.order_by("id").values("id", "name"))
+
+
+def changes_since(visibility, params):
+    """Payload of ``/api/changes`` for GET ``params`` (``token``, ``limit``, ``fields``)."""
+    since = parse_token(params.get("token"))
+    limit = parse_limit(params.get("limit"))
+    fields = parse_fields(params.get("fields"))
+    rows = list(
+        CatalogChange.objects.filter(pk__gt=since).order_by("pk").values_list("pk", "kind", "object_id", "deleted")[
+            :limit
+        ]
+    )
+    # Only the latest entry per object matters
+    latest = {}
+    for _, kind, object_id, deleted in rows:
+        latest[(kind, object_id)] = deleted
+    changed = {CatalogChange.SHEET: [], CatalogChange.TAG: []}
+    for (kind, object_id), deleted in latest.items():
+        if not deleted:
+            changed[kind].append(object_id)
+
+    sheets = []
+    if changed[CatalogChange.SHEET]:
+        sheet_rows = list(
+            sheets_for_visibility(visibility)
+            .filter(pk__in=changed[CatalogChange.SHEET])
+            .order_by("id")
+            .values(*sheet_columns(fields, ["id"]))
+        )
+        sheets = serialize(sheet_rows, fields if "id" in fields else ["id"] + fields)
+    tags = _visible_tags(visibility, changed[CatalogChange.TAG]) if changed[CatalogChange.TAG] else []
+
+    present = {CatalogChange.SHEET: {s["id"] for s in sheets}, CatalogChange.TAG: {t["id"] for t in tags}}
+    deleted = {CatalogChange.SHEET: [], CatalogChange.TAG: []}
+    for kind, object_id in sorted(latest):
+        if object_id not in present[kind]:
+            deleted[kind].append(object_id)
+
+    return {
+        "token": str(rows[-1][0] if rows else since),
+        "more": len(rows) == limit,
+        "sheets": sheets,
+        "tags": tags,
+        "deleted": {"sheets": deleted[CatalogChange.SHEET], "tags": deleted[CatalogChange.TAG]},
+    }
+
+
+def compact_changes():
+    """Delete feed entries superseded by a newer one for the same object; return the count."""
+    qn = connection.ops.quote_name
+    table = qn(CatalogChange._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} AS old USING {table} AS new "
+            f"WHERE new.{qn('kind')} = old.{qn('kind')} AND new.{qn('object_id')} = old.{qn('object_id')} "
+            f"AND new.{qn('id')} > old.{qn('id')}"
+        )
+        return cursor.rowcount
@@ -0,0 +1,105 @@
+"""
+Batched tag resolution shared by the views, the admin and importers.
+
+Notes for future maintainers:
+- ``resolve_tags`` looks up all names in one query against the
+  case-insensitive unique index (Lower(name)) and creates the missing ones
+  with a single ``bulk_create(ignore_conflicts=True)``. A concurrent editor
+  creating the same tag simply loses the insert and the row is re-read.
+  Created tags are recorded in the sync feed (sync.py) as bulk_create sends
+  no post_save.
+- ``set_sheet_tags`` applies the m2m diff in one statement and then sends
+  ``m2m_changed`` (post_remove / post_add) with the exact ids, so the signal
+  handlers in signals.py still see every change.
+"""
+
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.db.models.signals import m2m_changed
+
+from .models import CatalogChange, Sheet, Tag
+from .sync import record_changes
+
+TAG_MAX_LENGTH = Tag._meta.get_field("name").max_length
+
+
+def parse_tag_names(value):
+    """Split comma-separated input into names, deduplicated case-insensitively.
+
+    Accepts a string or an iterable of names; keeps first-seen casing/order.
+    """
+    if isinstance(value, str):
+        value = value.split(",")
+    names, seen = [], set()
+    for name in value or ():
+        name = (name or "").strip()[:TAG_MAX_LENGTH]
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def _existing_by_lower(lowered):
+    tags = Tag.objects.annotate(name_lower=Lower("name")).filter(name_lower__in=lowered)
+    return {tag.name_lower: tag for tag in tags}
+
+
+def resolve_tags(names):
+    """Return Tag objects for ``names`` (same order), creating missing ones."""
+    names = parse_tag_names(names)
+    if not names:
+        return []
+    lowered = [name.lower() for name in names]
+    existing = _existing_by_lower(lowered)
+    missing = [name for name in names if name.lower() not in existing]
+    if missing:
+        Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+        # ignore_conflicts returns no primary keys; read the rows back
+        created = _existing_by_lower([name.lower() for name in missing])
+        existing.update(created)
+        record_changes(CatalogChange.TAG, [tag.pk for tag in created.values()])
+    return [existing[key] for key in lowered]
+
+
+_APPLY_DIFF_SQL = """
+WITH removed AS (
+    DELETE FROM {through} WHERE {sheet_col} = %(sheet)s AND NOT ({tag_col} = ANY(%(tags)s::bigint[]))
+    RETURNING {tag_col}
+), added AS (
+    INSERT INTO {through} ({sheet_col}, {tag_col})
+    SELECT %(sheet)s, tag_id FROM unnest(%(tags)s::bigint[]) AS tag_id
+    ON CONFLICT DO NOTHING
+    RETURNING {tag_col}
+)
+SELECT 'removed', {tag_col} FROM removed
+UNION ALL
+SELECT 'added', {tag_col} FROM added
+"""
+
+
+def set_sheet_tags(sheet, names):
+    """Make ``sheet``'s tags exactly ``names`` (string or iterable); return them."""
+    tags = resolve_tags(names)
+    through = Sheet.tags.through
+    qn = connection.ops.quote_name
+    sql = _APPLY_DIFF_SQL.format(
+        through=qn(through._meta.db_table),
+        sheet_col=qn(through._meta.get_field("sheet").column),
+        tag_col=qn(through._meta.get_field("tag").column),
+    )
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {"sheet": sheet.pk, "tags": [tag.pk for tag in tags]})
+            rows = cursor.fetchall()
+        diff = {"removed": set(), "added": set()}
+        for kind, tag_id in rows:
+            diff[kind].add(tag_id)
+        for action, pk_set in (("post_remove", diff["removed"]), ("post_add", diff["added"])):
+            if pk_set:
+                m2m_changed.send(
+                    sender=through, instance=sheet, action=action, reverse=False,
+                    model=Tag, pk_set=pk_set, using=connection.alias,
+                )
+    # Drop any stale prefetch so sheet.tags.all() reflects the new set
+    getattr(sheet, "_prefetched_objects_cache", {}).pop("tags", None)
+    return tags
@@ -0,0 +1,38 @@
+from django import template
+from django.utils.html import format_html
+
+from sheet_music_app.images import derivative_url, get_manifest, srcset
+
+register = template.Library()
+
+# Cards are at most ~350px wide on the listing grid (3 columns on lg screens,
+# 1 column on phones); the browser picks the matching derivative.
+DEFAULT_SIZES = "(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw"
+
+
+@register.simple_tag
+def responsive_img(image, alt="", sizes=DEFAULT_SIZES, css_class=""):
+    """<picture> with WebP and JPEG srcsets for an ImageField file.
+
+    Falls back to a plain <img> of the original when derivatives cannot be built.
+    """
+    manifest = get_manifest(image)
+    if not manifest:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', image.url, alt, css_class)
+    widths = manifest["widths"]
+    # Browsers without srcset support get the middle size
+    fallback = widths[len(widths) // 2]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" '
+        'loading="lazy" decoding="async"></picture>',
+        srcset(image, manifest, "webp"),
+        sizes,
+        derivative_url(image, fallback, "jpg"),
+        srcset(image, manifest, "jpg"),
+        sizes,
+        fallback,
+        manifest["height"][fallback],
+        alt,
+        css_class,
+    )
@@ -1,22 +1,29 @@
 from django import template
-from django.contrib.auth.models import Group, Permission
+
+from sheet_music_app.roles import roles_for_user
 
 register = template.Library()
 
+# All filters read the per-request Roles memoised on the user object (see
+# roles.py), so using them inside loops costs no extra queries.
+
 @register.filter(name='is_editor')
 def is_editor(user):
     """Check if user is an editor (staff member)"""
     if not hasattr(user, 'is_authenticated'):
         return False
-    return user.is_authenticated and (user.is_staff or user.is_superuser)
+    return roles_for_user(user).is_editor
 
 @register.filter(name='is_superuser')
 def is_superuser(user):
     """Check if user is an admin (superuser)"""
     if not hasattr(user, 'is_authenticated'):
         return False
-    return user.is_authenticated and (user.is_superuser)
+    return roles_for_user(user).is_superuser
 
 @register.filter(name='in_group')
 def in_group(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    """Check if user belongs to the named group"""
+    if not hasattr(user, 'is_authenticated'):
+        return False
+    return roles_for_user(user).in_group(group_name)
@@ -1,3 +1,689 @@
-from django.test import TestCase
+import hashlib
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.mail.backends import locmem
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import previews, storage, uploads
+from .catalog import filter_sheets
+from .models import CatalogChange, OutboundEmail, Sheet, Tag
+from .outbox import drain
+from .pagination import KeysetPaginator, encode_cursor
+from .sync import changes_since, compact_changes
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "EXPLAIN plans are PostgreSQL specific")
+class SheetListingPlanTests(TestCase):
+    """Regression guard: the home() filter combinations must use index scans.
+
+    Seeds a catalog large enough that PostgreSQL prefers an index over a
+    sequential scan whenever a suitable index exists, then EXPLAINs the
+    exact queries the listing issues.
+    """
+
+    SHEET_COUNT = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        rnd = random.Random(42)
+        user = User.objects.create(username="seed")
+        casts = [code for code, _ in Sheet.CAST_CHOICES] + [None]
+        seasons = [code for code, _ in Sheet.SEASON_CHOICES] + [None]
+        uses = [code for code, _ in Sheet.USE_CHOICES] + [None]
+        Sheet.objects.bulk_create(
+            [
+                Sheet(
+                    title=f"Sheet {rnd.randrange(10**6):06d}",
+                    composer="Anonymous",
+                    cast=rnd.choice(casts),
+                    season=rnd.choice(seasons),
+                    use=rnd.choice(uses),
+                    publication_year=rnd.randrange(1800, 2025),
+                    public=rnd.random() < 0.5,
+                    slug=f"sheet-{i}",
+                    sheet_file=f"sheet-{i}.pdf",
+                    created_by=user,
+                    modified_by=user,
+                )
+                for i in range(cls.SHEET_COUNT)
+            ],
+            batch_size=2000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Sheet._meta.db_table}")
+
+    def listing_plan(self, public_only, **params):
+        """EXPLAIN the first-page query home() runs for the given filters."""
+        sheets = Sheet.objects.filter(public=True) if public_only else Sheet.objects.all()
+        query = QueryDict(mutable=True)
+        query.update(params)
+        sheets = filter_sheets(sheets, query)
+        paginator = KeysetPaginator(sheets, 6, keys=("title", "id"))
+        return paginator.queryset.order_by(*paginator.keys)[: paginator.per_page + 1].explain()
+
+    def assertUsesIndex(self, plan):
+        self.assertNotIn(f"Seq Scan on {Sheet._meta.db_table}", plan)
+        self.assertIn("Index", plan)
+
+    def test_unfiltered_listing_uses_index(self):
+        for public_only in (True, False):
+            with self.subTest(public_only=public_only):
+                self.assertUsesIndex(self.listing_plan(public_only))
+
+    def test_single_filters_use_index(self):
+        filters = [
+            {"cast": "SATB"},
+            {"season": "ADVENT"},
+            {"use": "EUCHARIST"},
+            {"year": "1900"},
+        ]
+        for params, public_only in itertools.product(filters, (True, False)):
+            with self.subTest(params=params, public_only=public_only):
+                self.assertUsesIndex(self.listing_plan(public_only, **params))
+
+    def test_combined_filters_use_index(self):
+        combos = [
+            {"cast": "SATB", "season": "ADVENT"},
+            {"season": "CHRISTMAS", "use": "HYMNS"},
+            {"cast": "SSA", "use": "FUNERAL", "year": "1950"},
+        ]
+        for params, public_only in itertools.product(combos, (True, False)):
+            with self.subTest(params=params, public_only=public_only):
+                self.assertUsesIndex(self.listing_plan(public_only, **params))
+
+    def test_public_listing_prefers_partial_index(self):
+        plan = self.listing_plan(True, cast="SATB")
+        self.assertIn("sheet_public_cast_idx", plan)
+
+
+class FlakyBackend(locmem.EmailBackend):
+    """locmem backend that refuses recipients containing "fail"."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any("fail" in address for address in message.recipients()):
+                raise OSError("550 mailbox unavailable")
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="sheet_music_app.outbox.OutboxBackend",
+    OUTBOX_DELIVERY_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    OUTBOX_MAX_ATTEMPTS=2,
+)
+class OutboxTests(TestCase):
+    def test_register_only_queues(self):
+        response = self.client.post(
+            "/register/",
+            {
+                "username": "novak",
+                "email": "novak@example.com",
+                "password1": "Dlouhe-heslo-123",
+                "password2": "Dlouhe-heslo-123",
+            },
+            HTTP_HOST="localhost",
+            secure=True,
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(User.objects.filter(username="novak").count(), 1)
+        self.assertEqual(mail.outbox, [])
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.to, ["novak@example.com"])
+        self.assertEqual(queued.alternatives[0][1], "text/html")
+
+        self.assertEqual(drain(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.SENT)
+
+    def test_password_reset_only_queues(self):
+        User.objects.create_user("svoboda", "svoboda@example.com", "x")
+        self.client.post("/password_reset/", {"email": "svoboda@example.com"}, HTTP_HOST="localhost", secure=True)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboundEmail.objects.filter(to=["svoboda@example.com"]).count(), 1)
+
+    @override_settings(OUTBOX_DELIVERY_BACKEND="sheet_music_app.tests.FlakyBackend")
+    def test_retry_then_dead_letter(self):
+        mail.send_mail("Ok", "body", "noty@example.com", ["ok@example.com"])
+        mail.send_mail("Bad", "body", "noty@example.com", ["fail@example.com"])
+
+        self.assertEqual(drain(), (1, 1))
+        bad = OutboundEmail.objects.get(subject="Bad")
+        self.assertEqual((bad.status, bad.attempts), (OutboundEmail.QUEUED, 1))
+        self.assertGreater(bad.next_attempt_at, timezone.now())
+
+        # Not due yet, then due again: the second failure dead-letters it
+        self.assertEqual(drain(), (0, 0))
+        OutboundEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(drain(), (0, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, OutboundEmail.DEAD)
+        self.assertIn("550", bad.last_error)
+        self.assertEqual([m.subject for m in mail.outbox], ["Ok"])
+
+
+class SyncFeedTests(TestCase):
+    """The /api/changes feed (sync.py) as a mirroring client sees it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="editor")
+
+    def sheet(self, title, public=True):
+        return Sheet.objects.create(title=title, public=public, created_by=self.user, modified_by=self.user)
+
+    def feed(self, visibility="all", **params):
+        query = QueryDict(mutable=True)
+        query.update({key: str(value) for key, value in params.items()})
+        return changes_since(visibility, query)
+
+    def latest_token(self):
+        return str(CatalogChange.objects.order_by("-pk").values_list("pk", flat=True).first() or 0)
+
+    def test_token_paging(self):
+        token = self.latest_token()
+        titles = ["Ave Maria", "Gloria", "Magnificat"]
+        for title in titles:
+            self.sheet(title)
+        seen = []
+        first = self.feed(token=token, limit=2, fields="title")
+        self.assertTrue(first["more"])
+        seen += [sheet["title"] for sheet in first["sheets"]]
+        rest = self.feed(token=first["token"], limit=2, fields="title")
+        seen += [sheet["title"] for sheet in rest["sheets"]]
+        self.assertCountEqual(seen, titles)
+        last = self.feed(token=rest["token"], limit=2)
+        self.assertFalse(last["more"])
+        self.assertEqual((last["token"], last["sheets"]), (rest["token"], []))
+
+    def test_deleted_sheet_leaves_tombstone(self):
+        sheet = self.sheet("Te Deum")
+        pk = sheet.pk
+        token = self.latest_token()
+        sheet.delete()
+        page = self.feed(token=token)
+        self.assertEqual(page["sheets"], [])
+        self.assertEqual(page["deleted"]["sheets"], [pk])
+
+    def test_private_sheets_are_deleted_for_public_clients(self):
+        sheet = self.sheet("Requiem", public=False)
+        page = self.feed("public")
+        self.assertIn(sheet.pk, page["deleted"]["sheets"])
+        self.assertNotIn(sheet.pk, [item["id"] for item in page["sheets"]])
+
+    def test_public_clients_receive_tags_once_on_a_public_sheet(self):
+        tag = Tag.objects.create(name="advent")
+        token = self.latest_token()
+        self.assertIn(tag.pk, self.feed("public")["deleted"]["tags"])
+
+        sheet = self.sheet("Rorate caeli")
+        sheet.tags.add(tag)
+        page = self.feed("public", token=token)
+        self.assertEqual(page["tags"], [{"id": tag.pk, "name": "advent"}])
+
+        token = self.latest_token()
+        sheet.public = False
+        sheet.save()
+        self.assertEqual(self.feed("public", token=token)["deleted"]["tags"], [tag.pk])
+
+        token = self.latest_token()
+        sheet.public = True
+        sheet.save()
+        self.assertEqual(self.feed("public", token=token)["tags"], [{"id": tag.pk, "name": "advent"}])
+
+        token = self.latest_token()
+        sheet.tags.clear()
+        self.assertEqual(self.feed("public", token=token)["deleted"]["tags"], [tag.pk])
+
+    def test_compact_changes_keeps_the_feed_correct(self):
+        sheet = self.sheet("Stabat Mater")
+        gone = self.sheet("Salve Regina")
+        for title in ("Stabat Mater I", "Stabat Mater II"):
+            sheet.title = title
+            sheet.save()
+        gone_pk = gone.pk
+        gone.delete()
+        before = self.feed(fields="title")
+
+        self.assertGreater(compact_changes(), 0)
+        self.assertEqual(compact_changes(), 0)
+        after = self.feed(fields="title")
+        self.assertEqual(after["sheets"], before["sheets"])
+        self.assertEqual(after["deleted"], before["deleted"])
+        self.assertIn({"id": sheet.pk, "title": "Stabat Mater II"}, after["sheets"])
+        self.assertIn(gone_pk, after["deleted"]["sheets"])
+        self.assertEqual(CatalogChange.objects.filter(kind=CatalogChange.SHEET, object_id=sheet.pk).count(), 1)
+
+
+class MediaRootMixin:
+    """Run against a throwaway MEDIA_ROOT (blobs, partial uploads)."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch.object(uploads, "UPLOAD_ROOT", os.path.join(self.media_root, "uploads"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+@mock.patch.object(uploads, "PART_SIZE", 4)
+class ChunkedUploadTests(MediaRootMixin, TestCase):
+    """The chunked upload API (uploads.py) as chunked_upload.js drives it."""
+
+    DATA = b"0123456789"  # three parts of 4, 4 and 2 bytes
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("editor", password="x")
+        self.client.force_login(self.user)
+
+    def call(self, method, path, data=b"", content_type="application/octet-stream", **extra):
+        return getattr(self.client, method)(
+            path, data, content_type=content_type, HTTP_HOST="localhost", secure=True, **extra
+        )
+
+    def create(self, data=DATA, **payload):
+        payload = {"filename": "mse.pdf", "size": len(data), **payload}
+        response = self.call("post", "/uploads/", json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put_part(self, upload, index, data=DATA, **extra):
+        part_size = upload["part_size"]
+        part = data[index * part_size : (index + 1) * part_size]
+        return self.call("put", f"/uploads/{upload['id']}/parts/{index}", part, **extra)
+
+    def test_short_last_part_completes(self):
+        upload = self.create()
+        state = upload
+        sent = []
+        # The client loop: send next_part until every byte has arrived
+        while state["received"] < state["size"]:
+            sent.append(state["next_part"])
+            response = self.put_part(upload, state["next_part"])
+            self.assertEqual(response.status_code, 200)
+            state = response.json()
+        self.assertEqual(sent, [0, 1, 2])
+        self.assertEqual(state["next_part"], 3)
+
+        response = self.call("post", f"/uploads/{upload['id']}/complete")
+        self.assertEqual(response.json()["status"], "complete")
+        name = uploads.attach_upload(upload["id"], self.user)
+        with uploads.sheet_storage.open(name) as fh:
+            self.assertEqual(fh.read(), self.DATA)
+
+    def send_all(self, upload, data=DATA):
+        for index in range(-(-len(data) // upload["part_size"])):
+            self.assertEqual(self.put_part(upload, index, data).status_code, 200)
+
+    def test_checksum_mismatch_resets_the_upload(self):
+        upload = self.create(sha256=hashlib.sha256(b"something else").hexdigest())
+        self.send_all(upload)
+        response = self.call("post", f"/uploads/{upload['id']}/complete")
+        self.assertEqual(response.status_code, 422)
+        # The reset is committed: the client starts over from part 0
+        state = self.call("get", f"/uploads/{upload['id']}").json()
+        self.assertEqual((state["received"], state["next_part"], state["status"]), (0, 0, "open"))
+        self.assertEqual(self.call("post", f"/uploads/{upload['id']}/complete").status_code, 409)
+
+    def test_lost_partial_file_is_not_a_server_error(self):
+        upload = self.create()
+        self.send_all(upload)
+        os.unlink(os.path.join(uploads.UPLOAD_ROOT, f"{upload['id']}.part"))
+        response = self.call("post", f"/uploads/{upload['id']}/complete")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.call("get", f"/uploads/{upload['id']}").json()["received"], 0)
+
+    def test_retried_part_is_a_no_op(self):
+        upload = self.create()
+        first = self.put_part(upload, 0).json()
+        again = self.put_part(upload, 0, b"XXXXXXXXXX").json()
+        self.assertEqual((again["received"], again["next_part"]), (first["received"], 1))
+        self.send_all(upload)
+        self.call("post", f"/uploads/{upload['id']}/complete")
+        with uploads.sheet_storage.open(uploads.attach_upload(upload["id"], self.user)) as fh:
+            self.assertEqual(fh.read(), self.DATA)
+
+    def test_part_out_of_order_is_refused(self):
+        upload = self.create()
+        response = self.put_part(upload, 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("part 0", response.json()["error"])
+        self.assertEqual(self.call("get", f"/uploads/{upload['id']}").json()["received"], 0)
+
+    def test_wrong_part_checksum_is_refused(self):
+        upload = self.create()
+        response = self.put_part(upload, 0, HTTP_X_PART_SHA256=hashlib.sha256(b"nope").hexdigest())
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.call("get", f"/uploads/{upload['id']}").json()["received"], 0)
+
+    def test_attach_requires_a_complete_upload(self):
+        upload = self.create()
+        with self.assertRaises(uploads.UploadError):
+            uploads.attach_upload(upload["id"], self.user)
+
+    def test_other_users_upload_is_not_found(self):
+        upload = self.create()
+        other = User.objects.create_user("intruder", password="x")
+        self.client.force_login(other)
+        self.assertEqual(self.call("get", f"/uploads/{upload['id']}").status_code, 404)
+        self.assertEqual(self.put_part(upload, 0).status_code, 404)
+        self.assertEqual(self.call("post", f"/uploads/{upload['id']}/complete").status_code, 404)
+        with self.assertRaises(uploads.UploadError):
+            uploads.attach_upload(upload["id"], other)
+
+
+class PreviewNamingTests(MediaRootMixin, TestCase):
+    """Generated previews are named by content (previews.generate_preview)."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username="editor")
+
+    def sheet(self, pdf=b"%PDF-1.4 score"):
+        sheet = Sheet(title="Ave verum", created_by=self.user, modified_by=self.user)
+        sheet.sheet_file.save("score.pdf", ContentFile(pdf), save=False)
+        sheet.save()
+        return sheet
+
+    def render(self, sheet, color):
+        def render_first_page(pdf_path, width=None):
+            from PIL import Image
+
+            path = os.path.join(tempfile.mkdtemp(), "page.png")
+            Image.new("RGB", (40, 60), color).save(path)
+            return path
+
+        with mock.patch.object(previews, "render_first_page", render_first_page):
+            name = previews.generate_preview(Sheet.objects.get(pk=sheet.pk))
+        return name
+
+    def test_names_are_content_hashes_and_never_reused(self):
+        sheet = self.sheet()
+        first = self.render(sheet, "white")
+        self.assertRegex(first, r"^previews/[0-9a-f]{64}\.png$")
+        second = self.render(sheet, "black")
+        third = self.render(sheet, "red")
+        self.assertEqual(len({first, second, third}), 3)
+        # The replaced previews are gone, the current one is stored
+        storage = Sheet.objects.get(pk=sheet.pk).preview_image.storage
+        self.assertEqual([storage.exists(name) for name in (first, second, third)], [False, False, True])
+        self.assertEqual(self.render(sheet, "white"), first)
+
+    def test_shared_preview_survives_a_re_render(self):
+        one, two = self.sheet(), self.sheet()
+        shared = self.render(one, "white")
+        self.assertEqual(self.render(two, "white"), shared)
+        self.render(one, "black")
+        storage = Sheet.objects.get(pk=two.pk).preview_image.storage
+        self.assertTrue(storage.exists(shared))
+        self.assertEqual(Sheet.objects.get(pk=two.pk).preview_image.name, shared)
+
+
+class SheetProfileVisibilityTests(TestCase):
+    """Private sheets stay hidden from the detail page, like in home()."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user("zpevak", password="x")
+        cls.private = Sheet.objects.create(title="Interni", public=False, created_by=cls.viewer, modified_by=cls.viewer)
+
+    def setUp(self):
+        self.client.force_login(self.viewer)
+
+    def get(self, path, **extra):
+        return self.client.get(path, HTTP_HOST="localhost", secure=True, **extra)
+
+    def test_private_sheet_is_not_found(self):
+        self.assertEqual(self.get(f"/noty/{self.private.slug}").status_code, 404)
+        self.assertEqual(self.get(f"/noty/id/{self.private.pk}").status_code, 404)
+
+    def test_conditional_request_does_not_reveal_private_slugs(self):
+        response = self.get(f"/noty/{self.private.slug}", HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response)
+
+
+@mock.patch.object(storage, "BLOB_GRACE_SECONDS", 0)
+class BlobStorageTests(MediaRootMixin, TestCase):
+    """Content-addressed sheet files (storage.py) and their reference counting."""
+
+    PDF = b"%PDF-1.4 Ave Maria"
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username="editor")
+
+    def sheet(self, filename="ave.pdf", data=PDF):
+        sheet = Sheet(title="Ave Maria", created_by=self.user, modified_by=self.user)
+        sheet.sheet_file.save(filename, ContentFile(data), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            sheet.save()
+        return sheet
+
+    def delete(self, sheet):
+        with self.captureOnCommitCallbacks(execute=True):
+            sheet.delete()
+
+    def exists(self, name):
+        return storage.sheet_storage.exists(name)
+
+    def test_identical_uploads_share_one_blob(self):
+        one, two = self.sheet("ave.pdf"), self.sheet("Ave Maria (copy).pdf")
+        digest = hashlib.sha256(self.PDF).hexdigest()
+        self.assertEqual(one.sheet_file.name, f"blobs/{digest[:2]}/{digest}.pdf")
+        self.assertEqual(two.sheet_file.name, one.sheet_file.name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "blobs", digest[:2])), [f"{digest}.pdf"])
+
+    def test_shared_blob_survives_until_the_last_sheet_goes(self):
+        one, two = self.sheet(), self.sheet()
+        name = one.sheet_file.name
+        self.delete(one)
+        self.assertTrue(self.exists(name))
+        self.delete(two)
+        self.assertFalse(self.exists(name))
+
+    def test_replaced_file_is_released_only_when_unused(self):
+        one, two = self.sheet(), self.sheet()
+        old = one.sheet_file.name
+        one = Sheet.objects.get(pk=one.pk)
+        one.sheet_file.save("new.pdf", ContentFile(b"%PDF-1.4 Salve Regina"), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            one.save()
+        self.assertTrue(self.exists(old))  # still used by the other sheet
+        two = Sheet.objects.get(pk=two.pk)
+        two.sheet_file.name = one.sheet_file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            two.save()
+        self.assertFalse(self.exists(old))
+        self.assertTrue(self.exists(one.sheet_file.name))
+
+    def test_dedup_media_moves_legacy_files(self):
+        legacy = os.path.join(self.media_root, "noty")
+        os.makedirs(legacy)
+        for filename in ("ave.pdf", "ave-copy.pdf"):
+            with open(os.path.join(legacy, filename), "wb") as fh:
+                fh.write(self.PDF)
+        one, two = self.sheet(), self.sheet()
+        Sheet.objects.filter(pk=one.pk).update(sheet_file="noty/ave.pdf")
+        Sheet.objects.filter(pk=two.pk).update(sheet_file="noty/ave-copy.pdf")
+
+        call_command("dedup_media", stdout=io.StringIO())
+        names = set(Sheet.objects.filter(pk__in=[one.pk, two.pk]).values_list("sheet_file", flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(storage.is_blob(name))
+        with storage.sheet_storage.open(name) as fh:
+            self.assertEqual(fh.read(), self.PDF)
+        self.assertEqual(os.listdir(legacy), [])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class KeysetPaginatorTests(TestCase):
+    """Cursor pages over (title, id) (pagination.KeysetPaginator)."""
+
+    TITLES = ["Gloria", "Gloria", "Gloria", "Kyrie", "Kyrie", "Sanctus", "Sanctus", "Sanctus"]
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="editor")
+        for title in cls.TITLES:
+            Sheet.objects.create(title=title, created_by=user, modified_by=user)
+        cls.ordered = list(Sheet.objects.order_by("title", "id").values_list("pk", flat=True))
+
+    def paginator(self, queryset=None):
+        return KeysetPaginator(queryset if queryset is not None else Sheet.objects.all(), 3)
+
+    def ids(self, page):
+        return [sheet.pk for sheet in page]
+
+    def test_forward_and_back_cover_every_row_once(self):
+        paginator = self.paginator()
+        pages = [paginator.get_page()]
+        self.assertFalse(pages[0].has_previous())
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], self.ordered)
+
+        # Walking back from the last page returns the same pages
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            self.assertTrue(page.has_previous())
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual(self.ids(page), self.ids(expected))
+            self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_values_rows_page_like_instances(self):
+        paginator = self.paginator(Sheet.objects.values("id", "title"))
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual([row["id"] for row in second], self.ordered[3:6])
+
+    def test_bad_cursors_fall_back_to_the_first_page(self):
+        first = self.ids(self.paginator().get_page())
+        cursors = [
+            "not a cursor",
+            encode_cursor([None, None], "n"),
+            encode_cursor(["Kyrie", "notanint"], "n"),
+            encode_cursor([{"title": "Kyrie"}, 1], "n"),
+            encode_cursor(["Kyrie", True], "n"),
+            encode_cursor(["Kyrie\x00", 1], "n"),
+            encode_cursor(["Kyrie"], "n"),
+            encode_cursor(["Kyrie", 1], "x"),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                page = self.paginator().get_page(cursor)
+                self.assertEqual(self.ids(page), first)
+                self.assertFalse(page.has_previous())
+
+    def test_count_is_cached(self):
+        self.assertEqual(self.paginator().count, len(self.TITLES))
+        Sheet.objects.filter(pk=self.ordered[0]).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator().count, len(self.TITLES))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ApiTests(TestCase):
+    """The read-only JSON API (api.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user("zpevak", password="x")
+        cls.staff = User.objects.create_user("sbormistr", password="x", is_staff=True)
+        cls.shared = Tag.objects.create(name="advent")
+        cls.secret = Tag.objects.create(name="interni")
+        cls.public = []
+        for i in range(5):
+            sheet = Sheet.objects.create(
+                title=f"Rorate {i}", composer="Anonym", public=True, created_by=cls.staff, modified_by=cls.staff
+            )
+            sheet.tags.add(cls.shared)
+            cls.public.append(sheet)
+        cls.private = Sheet.objects.create(
+            title="Rorate tajne", composer="Anonym", public=False, created_by=cls.staff, modified_by=cls.staff
+        )
+        cls.private.tags.add(cls.shared, cls.secret)
+
+    def get(self, path, user=None, **params):
+        if user is not None:
+            self.client.force_login(user)
+        return self.client.get(path, params, HTTP_HOST="localhost", secure=True)
+
+    def collect(self, path, user, key="title", **params):
+        """Follow ``next`` links; return the values of ``key`` and the last page."""
+        seen = []
+        payload = self.get(path, user, **params).json()
+        seen += [item[key] for item in payload["results"]]
+        while payload["next"]:
+            payload = self.get(payload["next"]).json()
+            seen += [item[key] for item in payload["results"]]
+        return seen, payload
+
+    def test_anonymous_requests_get_json_401(self):
+        for path in ("/api/sheets", f"/api/sheets/{self.public[0].pk}", "/api/tags", "/api/changes"):
+            with self.subTest(path=path):
+                response = self.get(path)
+                self.assertEqual(response.status_code, 401)
+                self.assertIn("error", response.json())
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.get("/api/sheets", self.viewer, fields="title,password")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["error"])
+        self.assertEqual(self.get(f"/api/sheets/{self.public[0].pk}", fields="nope").status_code, 400)
+
+    def test_sparse_fields(self):
+        payload = self.get(f"/api/sheets/{self.public[0].pk}", self.viewer, fields="title,tags").json()
+        self.assertEqual(payload, {"title": "Rorate 0", "tags": ["advent"]})
+
+    def test_private_sheets_are_hidden_from_public_viewers(self):
+        titles, _ = self.collect("/api/sheets", self.viewer)
+        self.assertNotIn("Rorate tajne", titles)
+        self.assertEqual(self.get(f"/api/sheets/{self.private.pk}").status_code, 404)
+        tags = self.get("/api/tags").json()["results"]
+        self.assertEqual(tags, [{"id": self.shared.pk, "name": "advent", "sheet_count": 5}])
+
+        titles, _ = self.collect("/api/sheets", self.staff)
+        self.assertIn("Rorate tajne", titles)
+        self.assertEqual(self.get(f"/api/sheets/{self.private.pk}").status_code, 200)
+        self.assertEqual(len(self.get("/api/tags").json()["results"]), 2)
+
+    def test_cursor_links_walk_the_listing(self):
+        titles, last = self.collect("/api/sheets", self.viewer, limit=2)
+        self.assertEqual(titles, [f"Rorate {i}" for i in range(5)])
+        self.assertEqual(last["count"], 5)
+        self.assertIn("cursor=", last["previous"])
+        self.assertIn("limit=2", last["previous"])
+        previous = self.get(last["previous"]).json()
+        self.assertEqual([item["title"] for item in previous["results"]], ["Rorate 2", "Rorate 3"])
+
+    def test_search_uses_page_links(self):
+        first = self.get("/api/sheets", self.viewer, q="Rorate", limit=2).json()
+        self.assertIn("page=2", first["next"])
+        self.assertIsNone(first["previous"])
+        titles, last = self.collect("/api/sheets", self.viewer, q="Rorate", limit=2)
+        self.assertCountEqual(titles, [f"Rorate {i}" for i in range(5)])
+        self.assertIn("page=2", last["previous"])
@@ -0,0 +1,192 @@
+"""
+Chunked, resumable uploads of large sheet files.
+
+Notes for future maintainers:
+- A client creates an upload (name, size, optional SHA-256), then PUTs the
+  file in fixed-size parts, in order. Each part is streamed from the request
+  straight to the partial file (never held in memory) and can be checked
+  against an ``X-Part-SHA256`` header. Parts are small enough for nginx's
+  body limit, and nginx buffers each one before handing it to gunicorn, so a
+  slow client never ties up a sync worker.
+- After a dropped connection the client asks for the upload state and
+  continues at ``next_part``; it equals the part count once every byte has
+  arrived, which is when the client completes the upload. Re-sending a part
+  that already arrived is a no-op, so retries are safe.
+- Completing an upload moves the partial file into content-addressed storage
+  (storage.py) without copying it; add/edit sheet then attach it by id.
+- Partial files live under CHUNKED_UPLOAD_ROOT, which must be on the same
+  filesystem as MEDIA_ROOT and is not served by nginx.
+  ``manage.py purge_uploads`` removes abandoned uploads.
+"""
+
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ChunkedUpload
+from .storage import release_blob, sheet_storage
+
+PART_SIZE = getattr(settings, "CHUNKED_UPLOAD_PART_SIZE", 8 * 1024 * 1024)
+MAX_SIZE = getattr(settings, "CHUNKED_UPLOAD_MAX_SIZE", 1024 * 1024 * 1024)
+UPLOAD_ROOT = getattr(settings, "CHUNKED_UPLOAD_ROOT", os.path.join(settings.MEDIA_ROOT, "uploads"))
+STREAM_CHUNK = 64 * 1024
+
+_SHA256_RE = re.compile(r"^[0-9a-fA-F]{64}$")
+
+
+class UploadError(Exception):
+    """Invalid upload request; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def partial_path(upload):
+    return os.path.join(UPLOAD_ROOT, f"{upload.pk}.part")
+
+
+def upload_state(upload):
+    return {
+        "id": str(upload.pk),
+        "filename": upload.filename,
+        "size": upload.size,
+        "part_size": upload.part_size,
+        "received": upload.received,
+        # Only the last part may be short, so this is the number of parts received
+        "next_part": -(-upload.received // upload.part_size),
+        "status": upload.status,
+    }
+
+
+def create_upload(user, filename, size, sha256=""):
+    filename = os.path.basename(str(filename or "")).strip()
+    if not filename:
+        raise UploadError("Missing filename.")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("Invalid size.")
+    if not 0 < size <= MAX_SIZE:
+        raise UploadError(f"Size must be between 1 byte and {MAX_SIZE} bytes.", status=413)
+    sha256 = (sha256 or "").strip()
+    if sha256 and not _SHA256_RE.match(sha256):
+        raise UploadError("Invalid SHA-256 checksum.")
+    return ChunkedUpload.objects.create(
+        created_by=user,
+        filename=filename[:255],
+        size=size,
+        sha256=sha256.lower(),
+        part_size=PART_SIZE,
+    )
+
+
+def _locked_upload(upload_id, user):
+    try:
+        return ChunkedUpload.objects.select_for_update().get(pk=upload_id, created_by=user)
+    except ChunkedUpload.DoesNotExist:
+        raise UploadError("Upload not found.", status=404)
+
+
+def write_part(upload_id, user, index, stream, length, part_sha256=""):
+    """Append part ``index`` read from ``stream``; return the upload."""
+    with transaction.atomic():
+        upload = _locked_upload(upload_id, user)
+        if upload.status != ChunkedUpload.OPEN:
+            raise UploadError("Upload is already complete.", status=409)
+        offset = index * upload.part_size
+        if offset < upload.received:
+            return upload  # retried part that already arrived
+        if offset > upload.received:
+            raise UploadError(f"Expected part {upload.received // upload.part_size}.", status=409)
+        expected = min(upload.part_size, upload.size - offset)
+        if length != expected:
+            raise UploadError(f"Part {index} must be {expected} bytes.")
+
+        os.makedirs(UPLOAD_ROOT, exist_ok=True)
+        digest = hashlib.sha256()
+        written = 0
+        fd = os.open(partial_path(upload), os.O_WRONLY | os.O_CREAT, 0o640)
+        try:
+            os.lseek(fd, offset, os.SEEK_SET)
+            while written < expected:
+                chunk = stream.read(min(STREAM_CHUNK, expected - written))
+                if not chunk:
+                    raise UploadError("Incomplete part, please resend it.")
+                digest.update(chunk)
+                os.write(fd, chunk)
+                written += len(chunk)
+            if part_sha256 and digest.hexdigest() != part_sha256.strip().lower():
+                raise UploadError("Part checksum mismatch, please resend it.", status=422)
+        except BaseException:
+            # Includes the client dropping the connection mid-part
+            os.ftruncate(fd, offset)
+            raise
+        finally:
+            os.close(fd)
+
+        upload.received = offset + written
+        upload.save(update_fields=["received", "updated_at"])
+    return upload
+
+
+def complete_upload(upload_id, user):
+    """Verify the assembled file and move it into sheet storage."""
+    error = None
+    with transaction.atomic():
+        upload = _locked_upload(upload_id, user)
+        if upload.status != ChunkedUpload.OPEN:
+            return upload
+        if upload.received != upload.size:
+            raise UploadError(f"Only {upload.received} of {upload.size} bytes received.", status=409)
+        path = partial_path(upload)
+        try:
+            upload.blob_name = sheet_storage.adopt(path, os.path.splitext(upload.filename)[1], upload.sha256)
+        except (ValueError, FileNotFoundError) as e:
+            # Corrupted or lost somewhere along the way: start over. The reset
+            # must be committed, so the error is raised after the block.
+            if os.path.exists(path):
+                os.unlink(path)
+            upload.received = 0
+            upload.save(update_fields=["received", "updated_at"])
+            if isinstance(e, ValueError):
+                error = UploadError("File checksum mismatch, upload it again.", status=422)
+            else:
+                error = UploadError("Uploaded data is missing, upload it again.", status=409)
+        else:
+            upload.status = ChunkedUpload.COMPLETE
+            upload.save(update_fields=["blob_name", "status", "updated_at"])
+    if error is not None:
+        raise error
+    return upload
+
+
+def attach_upload(upload_id, user):
+    """Claim a completed upload of ``user``; return its storage name.
+
+    Assign the result to ``Sheet.sheet_file`` and save the sheet.
+    """
+    with transaction.atomic():
+        upload = _locked_upload(upload_id, user)
+        if upload.status == ChunkedUpload.OPEN:
+            raise UploadError("Upload is not complete.", status=409)
+        # Attaching again is allowed: the sheet save that used it may have failed
+        upload.status = ChunkedUpload.ATTACHED
+        upload.save(update_fields=["status", "updated_at"])
+    return upload.blob_name
+
+
+def discard_upload(upload):
+    """Delete an abandoned upload together with its data."""
+    if upload.status == ChunkedUpload.OPEN:
+        try:
+            os.unlink(partial_path(upload))
+        except FileNotFoundError:
+            pass
+    upload.delete()
+    if upload.status == ChunkedUpload.COMPLETE:
+        # Never attached; the blob goes unless a sheet uses the same content
+        transaction.on_commit(lambda: release_blob(upload.blob_name))
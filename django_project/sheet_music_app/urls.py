@@ -18,6 +18,21 @@ urlpatterns = [
     # Backwards compatibility: legacy integer-ID URLs redirect to slug version
     path("noty/id/<int:pk>", views.sheet_profile_redirect_by_pk, name="sheet_profile_by_pk"),
     path("noty/<int:pk>", views.sheet_profile_redirect_by_pk),
+    # Sheet files, only through the visibility check (served by nginx, see downloads.py)
+    path("noty/id/<int:pk>/soubor", views.sheet_file, name="sheet_file"),
+    path("noty/id/<int:pk>/strana/<int:number>", views.sheet_page, name="sheet_page"),
+    # Streamed exports of the filtered listing (csv, jsonl or zip; see exports.py)
+    path("export/<str:fmt>", views.export_sheets, name="export_sheets"),
+    # Read-only JSON API over the catalog (see api.py)
+    path("api/sheets", views.api_sheets, name="api_sheets"),
+    path("api/sheets/<int:pk>", views.api_sheet, name="api_sheet"),
+    path("api/tags", views.api_tags, name="api_tags"),
+    path("api/changes", views.api_changes, name="api_changes"),
+    # Chunked, resumable uploads of large sheet files (see uploads.py)
+    path("uploads/", views.upload_create, name="upload_create"),
+    path("uploads/<uuid:upload_id>", views.upload_status, name="upload_status"),
+    path("uploads/<uuid:upload_id>/parts/<int:index>", views.upload_part, name="upload_part"),
+    path("uploads/<uuid:upload_id>/complete", views.upload_complete, name="upload_complete"),
     # Auth views
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html', next_page="home"), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='login'), name='logout'),
@@ -27,6 +42,9 @@ urlpatterns = [
     path("password_reset/done/", auth_views.PasswordResetDoneView.as_view(template_name="registration/password_reset_done.html"), name="password_reset_done"),
     path("reset/<uidb64>/<token>/", auth_views.PasswordResetConfirmView.as_view(template_name="registration/password_reset_confirm.html"), name="password_reset_confirm"),
     path("reset/done/", auth_views.PasswordResetCompleteView.as_view(template_name="registration/password_reset_done.html"), name="password_reset_complete"),
+    # Staff-only diagnostics
+    path("cache-stats/", views.cache_stats, name="cache_stats"),
+    path("metrics/", views.metrics, name="metrics"),
     # Static pages
     path("conditions/", views.terms_and_conditions, name="terms_and_conditions"),
     path("privacy/", views.privacy_policy, name="privacy_policy"),
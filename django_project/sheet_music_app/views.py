@@ -3,94 +3,116 @@ Views for the Sheet Music Database app.
 
 Notes for future maintainers:
 - Most views require authentication via @login_required (homepage and CRUD).
-- The homepage supports filtering, simple full-text search, and pagination.
+- The homepage supports filtering, full-text search (see search.py), and pagination.
 - Detail pages prefer slug URLs. A legacy PK-based route redirects to the slug.
 """
 
+import json
+import logging
+import os
+from functools import wraps
+
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.urls import reverse
-from .models import Sheet, Tag
+from .models import ChunkedUpload, Sheet
+from .api import ApiError, get_sheet, list_sheets, list_tags
+from .sync import changes_since
+from .catalog import filter_sheets, sheets_for_visibility, visible_sheets
+from .conditional import home_etag, home_last_modified, revalidate, sheet_etag, sheet_last_modified
+from .cards import card_cache_stats, render_sheet_cards
+from .dbmetrics import db_stats
+from .downloads import download_name, file_response, file_version
+from .exports import FORMATS, export_queryset, export_stream
+from .facets import get_facets
+from .metrics import render_prometheus
 from .forms import CustomUserCreationForm, PasswordResetForm
+from .pages import ensure_page, has_pages, page_count
+from .pagination import CachedCountPaginator, KeysetPaginator
+from .previews import PreviewError, queue_preview_if_needed
+from .roles import get_roles
+from .search import search_sheets
+from .tagging import set_sheet_tags
+from .uploads import UploadError, attach_upload, complete_upload, create_upload, upload_state, write_part
 from django.contrib.auth import logout
-from django.db.models import Q
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_http_methods
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
 
 # Homepage view, registered users only
 @login_required(login_url='login')
+@condition(etag_func=home_etag, last_modified_func=home_last_modified)
 def home(request):
-    # Access control: regular users see only public sheets; staff/superusers see all
-    if request.user.is_staff or request.user.is_superuser or request.user.groups.filter(name="Internal").exists():
-        sheets = Sheet.objects.all()
-    else:
-        sheets = Sheet.objects.filter(public=True)
-    
+    # Access control: regular users see only public sheets; staff/superusers see all.
+    # Roles are resolved once per request (see roles.py) and reused by templates.
+    roles = get_roles(request)
+    visibility = "all" if roles.can_view_private else "public"
+    sheets = sheets_for_visibility(visibility)
+
     # Apply filters (passed via GET). Values 'all' mean "no filter".
     cast = request.GET.get('cast')
     season = request.GET.get('season')
     use = request.GET.get('use')
     year = request.GET.get('year')
-    q = request.GET.get('q', '').strip()  # simple search query across several fields
-
-    if cast and cast != 'all':
-        sheets = sheets.filter(cast=cast)
-    if season and season != 'all':
-        sheets = sheets.filter(season=season)
-    if use and use != 'all':
-        sheets = sheets.filter(use=use)
-    if year and year != 'all':
-        sheets = sheets.filter(publication_year=year)
-
-    # Simple case-insensitive search across common text fields
+    q = request.GET.get('q', '').strip()  # full-text search query
+    sheets = filter_sheets(sheets, request.GET)
+
+    # Paginate 6 per page. Search results (GIN-indexed search_vector) are
+    # ordered by relevance and keep numbered pages; the plain listing pages by
+    # (title, id) cursor.
     if q:
-        sheets = sheets.filter(
-            Q(title__icontains=q)
-            | Q(composer__icontains=q)
-            | Q(arranger__icontains=q)
-            | Q(publisher__icontains=q)
-            | Q(isbn__icontains=q)
-            | Q(description__icontains=q)
-            | Q(tags__name__icontains=q)
-        ).distinct()
-
-    # Prefetch tags to avoid N+1 when rendering badges; paginate 6 per page
-    paginator = Paginator(sheets.prefetch_related('tags').order_by('title'), 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    return render(request, "home.html", {
+        paginator = CachedCountPaginator(search_sheets(sheets, q), 6)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    else:
+        paginator = KeysetPaginator(sheets, 6, keys=('title', 'id'))
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+
+    # Cards come from the fragment cache; tags are prefetched only for misses
+    cards = render_sheet_cards(list(page_obj), roles.viewer_role)
+
+    return revalidate(render(request, "home.html", {
         "sheets": page_obj,
-        "cast_choices": Sheet.CAST_CHOICES,
-        "season_choices": Sheet.SEASON_CHOICES,
-        "use_choices": Sheet.USE_CHOICES,
-        "years": Sheet.objects.values_list('publication_year', flat=True).distinct().order_by('publication_year'),
+        "cards": cards,
+        # Sidebar options with per-value counts, cached per visibility class
+        "facets": get_facets(visibility),
         "selected_cast": cast or 'all',
         "selected_season": season or 'all',
         "selected_use": use or 'all',
         "selected_year": year or 'all',
-        "is_superuser": request.user.is_superuser,
+        "is_superuser": roles.is_superuser,
         "query": q,
         "page_obj": page_obj,
         "paginator": paginator,
         "is_paginated": page_obj.has_other_pages(),
-    })
+        "cursor_pagination": not q,
+        # Filters and search without the page position, for the export links
+        "export_query": _without(request.GET, "page", "cursor").urlencode(),
+    }))
+
+def _without(params, *keys):
+    params = params.copy()
+    for key in keys:
+        params.pop(key, None)
+    return params
 
 # User registration view
 def register(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            form.save()
+            user = form.save()
             messages.success(request, 'Registrace úspěšná. Můžete se přihlásit.')
 
-            user = form.save()
+            # Only queued here (EMAIL_BACKEND is the outbox); send_outbox delivers it
             subject = render_to_string("emails/email_confirmation_subject.txt").strip()
             text_content = render_to_string("emails/email_confirmation_message.txt", {"user": user})
             html_content = render_to_string("emails/email_confirmation_message.html", {"user": user})
@@ -111,6 +133,15 @@ def register(request):
         form = CustomUserCreationForm()
     return render(request, 'registration/register.html', {'form': form})
     
+def _sheet_file_from_request(request, required=True):
+    """Uploaded sheet file: a chunked upload attached by id, or a plain multipart file."""
+    upload_id = request.POST.get("upload_id")
+    if upload_id:
+        return attach_upload(upload_id, request.user)
+    if required:
+        return request.FILES["sheet_file"]
+    return request.FILES.get("sheet_file")
+
 @login_required(login_url='login')
 def add_sheet(request):
     if request.method == "POST":
@@ -128,7 +159,7 @@ def add_sheet(request):
                 description=request.POST.get("description", ""),
                 created_by=request.user,
                 modified_by=request.user,
-                sheet_file=request.FILES["sheet_file"],
+                sheet_file=_sheet_file_from_request(request),
                 public=("public" in request.POST),
                 preview_image=request.FILES.get("preview_image")
             )
@@ -155,22 +186,12 @@ def add_sheet(request):
             # Persist to DB (model.save() also handles auto-slugging if needed)
             new_sheet.save()
 
-            # Tags: comma-separated list from input named "tags"
-            tags_input = request.POST.get("tags", "")
-            if tags_input:
-                tag_names = [t.strip() for t in tags_input.split(",")]
-                tag_objs = []
-                for name in tag_names:
-                    if not name:
-                        continue
-                    # Case-insensitive lookup; create preserving original casing
-                    existing = Tag.objects.filter(name__iexact=name).first()
-                    if existing:
-                        tag_objs.append(existing)
-                    else:
-                        tag_objs.append(Tag.objects.create(name=name))
-                if tag_objs:
-                    new_sheet.tags.add(*tag_objs)
+            # Tags: comma-separated list from input named "tags". Resolved in bulk,
+            # case-insensitively, creating missing tags with their original casing.
+            set_sheet_tags(new_sheet, request.POST.get("tags", ""))
+
+            # Render a preview from the PDF in the background (render_previews)
+            queue_preview_if_needed(new_sheet)
             
             messages.success(request, f"Successfully added '{new_sheet.title}'")
             
@@ -220,29 +241,19 @@ def edit_sheet(request, pk):
             sheet.modified_by = request.user
             sheet.public = "public" in request.POST
 
-            if "sheet_file" in request.FILES and request.FILES["sheet_file"]:
-                sheet.sheet_file = request.FILES["sheet_file"]
+            new_file = _sheet_file_from_request(request, required=False)
+            if new_file:
+                sheet.sheet_file = new_file
 
             if "preview_image" in request.FILES and request.FILES["preview_image"]:
                 sheet.preview_image = request.FILES["preview_image"]
 
             sheet.save()
 
-            # Update tags from comma-separated input
-            tags_input = request.POST.get("tags", "")
-            tag_objs = []
-            if tags_input:
-                tag_names = [t.strip() for t in tags_input.split(",")]
-                for name in tag_names:
-                    if not name:
-                        continue
-                    existing = Tag.objects.filter(name__iexact=name).first()
-                    if existing:
-                        tag_objs.append(existing)
-                    else:
-                        tag_objs.append(Tag.objects.create(name=name))
-            # If no tags_input provided (empty string), clear tags
-            sheet.tags.set(tag_objs)
+            # Update tags from comma-separated input (empty input clears tags)
+            set_sheet_tags(sheet, request.POST.get("tags", ""))
+            if new_file:
+                queue_preview_if_needed(sheet)
             messages.success(request, f"Successfully updated '{sheet.title}'")
             return redirect('home')
         except Exception as e:
@@ -264,18 +275,190 @@ def edit_sheet(request, pk):
     })
 
 @login_required(login_url='login')
+@condition(etag_func=sheet_etag, last_modified_func=sheet_last_modified)
 def sheet_profile(request, slug):
-    sheet = get_object_or_404(Sheet, slug=slug)
-    return render(request, "sheet_profile.html", {"sheet": sheet})
+    # Same visibility rules as home(): private sheets only for internal users
+    sheet = get_object_or_404(visible_sheets(request.user), slug=slug)
+    # PDFs in blob storage are shown as lazily loaded page images (pages.py);
+    # if the page count is unavailable the template embeds the PDF instead
+    pages = None
+    if has_pages(sheet.sheet_file.name):
+        try:
+            pages = range(1, page_count(sheet.sheet_file.name) + 1)
+        except PreviewError as e:
+            logger.warning("Page count of sheet %s failed: %s", sheet.pk, e)
+    return revalidate(render(request, "sheet_profile.html", {
+        "sheet": sheet,
+        "pages": pages,
+        "file_version": file_version(sheet.sheet_file.name),
+    }))
 
 @login_required(login_url='login')
 def sheet_profile_redirect_by_pk(request, pk):
-    sheet = get_object_or_404(Sheet, pk=pk)
+    sheet = get_object_or_404(visible_sheets(request.user), pk=pk)
     # Backfill slug if missing to guarantee redirect works
     if not sheet.slug:
         sheet.save()  # triggers auto slug generation in model.save()
     return HttpResponseRedirect(reverse('sheet_profile', kwargs={'slug': sheet.slug}))
 
+# Sheet file delivery: visibility is checked here, nginx sends the bytes
+@login_required(login_url='login')
+def sheet_file(request, pk):
+    row = (
+        visible_sheets(request.user)
+        .filter(pk=pk)
+        .exclude(sheet_file="")
+        .values_list("sheet_file", "slug")
+        .first()
+    )
+    if row is None:
+        raise Http404("Noty nenalezeny")
+    name, slug = row
+    return file_response(
+        name,
+        download_name(slug, pk, name),
+        immutable=request.GET.get("v") == file_version(name) != "",
+        as_attachment="download" in request.GET,
+    )
+
+# One page image of the detail page viewer (see pages.py)
+@login_required(login_url='login')
+def sheet_page(request, pk, number):
+    row = visible_sheets(request.user).filter(pk=pk).values_list("sheet_file", "slug").first()
+    if row is None or not has_pages(row[0]):
+        raise Http404("Noty nenalezeny")
+    name, slug = row
+    try:
+        if not 1 <= number <= page_count(name):
+            raise Http404("Strana neexistuje")
+        page = ensure_page(name, number)
+    except PreviewError as e:
+        logger.warning("Page %s of sheet %s failed: %s", number, pk, e)
+        raise Http404("Stranu nelze zobrazit")
+    return file_response(
+        page,
+        f"{slug or pk}-{number}.png",
+        immutable=request.GET.get("v") == file_version(name),
+    )
+
+# Streamed export of the filtered listing: CSV/JSONL metadata or a ZIP of the files (see exports.py)
+@login_required(login_url='login')
+def export_sheets(request, fmt):
+    if fmt not in FORMATS:
+        raise Http404("Neznámý formát exportu")
+    visibility = "all" if get_roles(request).can_view_private else "public"
+    response = StreamingHttpResponse(
+        export_stream(fmt, export_queryset(visibility, request.GET)), content_type=FORMATS[fmt]
+    )
+    response["Content-Disposition"] = f'attachment; filename="noty.{fmt}"'
+    # Let nginx pass chunks through instead of buffering the whole export
+    response["X-Accel-Buffering"] = "no"
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+# Read-only JSON API (see api.py); same visibility as home()
+def _api_response(payload, status=200):
+    return JsonResponse(payload, status=status, json_dumps_params={"separators": (",", ":"), "ensure_ascii": False})
+
+def _api_visibility(request):
+    return "all" if get_roles(request).can_view_private else "public"
+
+def _api_login_required(view):
+    """Like @login_required, but answers API clients with a JSON 401 instead of the login page."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _api_response({"error": "Authentication required."}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+@_api_login_required
+@require_http_methods(["GET"])
+def api_sheets(request):
+    try:
+        return _api_response(list_sheets(_api_visibility(request), request.GET))
+    except ApiError as e:
+        return _api_response({"error": str(e)}, status=400)
+
+@_api_login_required
+@require_http_methods(["GET"])
+def api_sheet(request, pk):
+    try:
+        payload = get_sheet(_api_visibility(request), pk, request.GET)
+    except ApiError as e:
+        return _api_response({"error": str(e)}, status=400)
+    if payload is None:
+        return _api_response({"error": "Not found."}, status=404)
+    return _api_response(payload)
+
+@_api_login_required
+@require_http_methods(["GET"])
+def api_tags(request):
+    return _api_response(list_tags(_api_visibility(request)))
+
+# Delta sync feed with tombstones (see sync.py)
+@_api_login_required
+@require_http_methods(["GET"])
+def api_changes(request):
+    try:
+        return _api_response(changes_since(_api_visibility(request), request.GET))
+    except ApiError as e:
+        return _api_response({"error": str(e)}, status=400)
+
+# Per-process cache and database connection statistics, staff only
+@staff_member_required(login_url='login')
+def cache_stats(request):
+    return JsonResponse({"pid": os.getpid(), "sheet_card": card_cache_stats(), "db": db_stats()})
+
+# Per-view request metrics of this process in Prometheus text format, staff only
+@staff_member_required(login_url='login')
+def metrics(request):
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Chunked upload API (see uploads.py), used by static/js/chunked_upload.js
+def _upload_error(e):
+    return JsonResponse({"error": str(e)}, status=e.status)
+
+@login_required(login_url='login')
+@require_http_methods(["POST"])
+def upload_create(request):
+    try:
+        payload = json.loads(request.body or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("not an object")
+        upload = create_upload(request.user, payload.get("filename"), payload.get("size"), payload.get("sha256"))
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON."}, status=400)
+    except UploadError as e:
+        return _upload_error(e)
+    return JsonResponse(upload_state(upload), status=201)
+
+@login_required(login_url='login')
+@require_http_methods(["GET"])
+def upload_status(request, upload_id):
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, created_by=request.user)
+    return JsonResponse(upload_state(upload))
+
+@login_required(login_url='login')
+@require_http_methods(["PUT"])
+def upload_part(request, upload_id, index):
+    # The body is streamed from the request, never read into memory at once
+    try:
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+        upload = write_part(upload_id, request.user, index, request, length, request.headers.get("X-Part-SHA256", ""))
+    except UploadError as e:
+        return _upload_error(e)
+    return JsonResponse(upload_state(upload))
+
+@login_required(login_url='login')
+@require_http_methods(["POST"])
+def upload_complete(request, upload_id):
+    try:
+        upload = complete_upload(upload_id, request.user)
+    except UploadError as e:
+        return _upload_error(e)
+    return JsonResponse(upload_state(upload))
+
 def terms_and_conditions(request):
     return render(request, "terms_and_conditions.html")
 
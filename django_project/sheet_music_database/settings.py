@@ -1,4 +1,5 @@
 from pathlib import Path
+from urllib.parse import urlsplit
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -11,8 +12,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 
+# Development profile (DJANGO_ENV=development): DEBUG and the dev-only apps
+# (browser reload). Production loads neither.
+DEV = os.getenv('DJANGO_ENV', 'production') == 'development'
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = False
+DEBUG = DEV
 
 ALLOWED_HOSTS = ["localhost", "127.0.0.1", "[::1]", "bohuslavkorejs.cz", "noty.bohuslavkorejs.cz", "168.119.231.102"]
 CSRF_TRUSTED_ORIGINS = ["http://localhost:8001", "https://localhost:8001", "http://127.0.0.1:8001", "https://127.0.0.1:8001", "http://[::1]:8001", "https://[::1]:8001", "http://bohuslavkorejs.cz", "https://bohuslavkorejs.cz", "http://168.119.231.102", "https://168.119.231.102", "http://168.119.231.102:8001", "https://168.119.231.102:8001"]
@@ -35,16 +40,18 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     "sheet_music_app",
-    "django_browser_reload",
+    "compressor",
     "allauth",
     "allauth.account",
 
 ]
 
+# Django's ModelBackend and allauth's backend, caching request.user (see auth.py)
 AUTHENTICATION_BACKENDS = (
-    "django.contrib.auth.backends.ModelBackend",
-    "allauth.account.auth_backends.AuthenticationBackend",
+    "sheet_music_app.auth.CachedModelBackend",
+    "sheet_music_app.auth.CachedAllauthBackend",
 )
 
 SITE_ID = 1
@@ -54,21 +61,28 @@ ACCOUNT_EMAIL_VERIFICATION = "mandatory"
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'sheet_music_app.dbmetrics.DBMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'sheet_music_app.roles.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "django_browser_reload.middleware.BrowserReloadMiddleware",
     "allauth.account.middleware.AccountMiddleware"
 ]
 
+if DEV:
+    INSTALLED_APPS += ["django_browser_reload"]
+    MIDDLEWARE += ["django_browser_reload.middleware.BrowserReloadMiddleware"]
+
 ROOT_URLCONF = 'sheet_music_database.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates that report their render time (see sheet_music_app/metrics.py)
+        'BACKEND': 'sheet_music_app.metrics.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,7 +100,10 @@ WSGI_APPLICATION = 'sheet_music_database.wsgi.application'
 
 
 # Email cofiguration - smtp2go service provider
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Views only queue mail in the database outbox; `manage.py send_outbox`
+# delivers it through OUTBOX_DELIVERY_BACKEND (see sheet_music_app/outbox.py)
+EMAIL_BACKEND = 'sheet_music_app.outbox.OutboxBackend'
+OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_PORT = os.getenv('EMAIL_PORT')
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
@@ -108,6 +125,17 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST'),
         'PORT': os.getenv('POSTGRES_PORT'),
+        # Keep connections open between requests (seconds; 0 closes them after
+        # every request) and check them before reuse.
+        # Metrics: sheet_music_app/dbmetrics.py
+        'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': os.getenv('POSTGRES_CONN_HEALTH_CHECKS', '1') == '1',
+        # Behind PgBouncer in transaction mode server-side cursors (used by
+        # .iterator() in the exports) must be disabled
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('POSTGRES_PGBOUNCER', '0') == '1',
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('POSTGRES_CONNECT_TIMEOUT', '5')),
+        },
     }
 }
 
@@ -150,10 +178,81 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / "staticfiles"
+# Content-hashed names plus .gz siblings (see sheet_music_app/staticstorage.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'sheet_music_app.staticstorage.PrecompressedManifestStaticFilesStorage'},
+}
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'compressor.finders.CompressorFinder',
+]
+
+# django-compressor: SCSS is compiled with libsass, CSS/JS minified with
+# rcssmin/rjsmin and bundled per {% compress %} block. Bundles are built
+# ahead of time by `manage.py compress` (run after collectstatic), never
+# during a request.
+COMPRESS_ENABLED = True
+COMPRESS_OFFLINE = not DEV
+COMPRESS_STORAGE = 'sheet_music_app.staticstorage.PrecompressedCompressorFileStorage'
+COMPRESS_PRECOMPILERS = (
+    ('text/x-scss', 'django_libsass.SassCompiler'),
+)
+COMPRESS_FILTERS = {
+    'css': ['compressor.filters.css_default.CssAbsoluteFilter', 'compressor.filters.cssmin.rCSSMinFilter'],
+    'js': ['compressor.filters.jsmin.rJSMinFilter'],
+}
 MEDIA_URL = '/media/'   
 MEDIA_ROOT = BASE_DIR / 'media'
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
+# Sheet files are handed to nginx via X-Accel-Redirect (see downloads.py).
+# Set SHEET_FILE_X_ACCEL=0 when running without nginx (runserver).
+SHEET_FILE_X_ACCEL = os.getenv('SHEET_FILE_X_ACCEL', '1') == '1'
+
+# Part of the ETag of conditional pages (see conditional.py); set it to the
+# release (e.g. the git commit) so that a deploy changing templates is not
+# answered with 304 Not Modified.
+SHEET_ETAG_RELEASE = os.getenv('SHEET_ETAG_RELEASE', '')
+
+# Requests issuing more queries are logged with their slowest SQL
+# (see sheet_music_app/metrics.py); 0 turns the check off.
+REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', '50'))
+
+# Cache shared by all workers (see sheet_music_app/caching.py). CACHE_URL
+# selects the backend: redis://host:6379/0, memcached://host:11211,
+# locmem:// (single process) or file:///path. Production needs Redis or
+# memcached (docker-compose runs Redis): only they make cache.add/incr atomic
+# across workers. The default file-based cache in BASE_DIR/.cache is meant for
+# development.
+CACHE_URL = os.getenv('CACHE_URL', f"file://{BASE_DIR / '.cache'}")
+_cache_url = urlsplit(CACHE_URL)
+if _cache_url.scheme in ('redis', 'rediss'):
+    _cache = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}
+elif _cache_url.scheme == 'memcached':
+    _cache = {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': _cache_url.netloc}
+elif _cache_url.scheme == 'locmem':
+    _cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+else:
+    _cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': _cache_url.path,
+        # Cards and listing counts need far more than the default 300 entries
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+CACHES = {
+    'default': {
+        **_cache,
+        'KEY_PREFIX': 'sheetdb',
+        # Bump to drop every cached value at once
+        'VERSION': int(os.getenv('CACHE_VERSION', '1')),
+    }
+}
+
+# Sessions are read from the cache and written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -7,9 +7,11 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("", include("sheet_music_app.urls")),
-    path("__reload__/", include("django_browser_reload.urls")),
     path("accounts/", include("allauth.urls")),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+if settings.DEV:
+    urlpatterns += [path("__reload__/", include("django_browser_reload.urls"))]
\ No newline at end of file